@@ -1,92 +1,78 @@
 # analyze_offers.py
 
+import argparse
 import csv
-import requests
-from bs4 import BeautifulSoup
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from openai import OpenAI
-import time
+
+from extract import ExtractionEngine, parse_offer_html
+from fetcher import Fetcher
+from http_cache import HttpCache
+from ledger import Ledger
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.llm_cache import LLMCache, cached_call, decision_of, make_key
+from common.llm_dispatcher import AdaptiveDispatcher, MAX_CONCURRENCY
+from common.llm_stream import chat_deltas, read_until_decision
+from common.embeddings import RelevanceScreen, offer_text
+from common.near_duplicates import NearDuplicateIndex, fingerprint
+from common.prefilter import PreFilter
+from common.prompt_builder import PROMPT_TOKEN_BUDGET, compact_fields, token_report
+from common.prompt_layout import PROMPT_LAYOUT, chat_messages, stable_context
+
+# Les processus de parsing lancés en "spawn" (Windows, macOS) réimportent ce module
+# sous le nom __mp_main__ : ils n'ont besoin que d'extract.py, ni de Selenium, ni des
+# bases SQLite, ni du contexte utilisateur.
+PARSE_WORKER = __name__ == "__mp_main__"
+if not PARSE_WORKER:
+    import scrap_actiris
 
 # LM Studio / OpenAI local client
 # Best gpt-oss-20b or on small config google/gemma-3n-e4b
 client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
 MODEL_NAME = "google/gemma-3n-e4b"  # ou le nom exact chargé dans LM Studio
+FILTERED_PATH = "filtered_offers.csv"
+REANALYZE_ON_MODEL_CHANGE = False  # ré-analyse les offres jugées par un autre modèle
+TEMPERATURE = 0.1
+MAX_TOKENS = 512
+STREAM_DECISION = True   # streaming : un NON coupe la génération dès la première ligne
+OUI_MODE = "continue"    # "defer" : justification des OUI générée plus tard (--justify)
+# Pré-sélection par embeddings : seule la meilleure fraction de chaque lot va au LLM
+EMBED_SCREEN = False
+EMBED_KEEP_FRACTION = 0.4
+EMBED_SCREEN_BATCH = 50
+# Score sous lequel une offre écartée est classée NON dans le ledger ; au-dessus, elle
+# n'a été écartée que par rapport à son lot : reportée au prochain lancement, puis
+# envoyée au LLM quoi qu'il arrive après EMBED_MAX_DEFERRALS reports
+EMBED_MIN_SCORE = 0.2
+EMBED_MAX_DEFERRALS = 2
+# Mode pipeline (--pipeline) : les liens trouvés par le scraper sont analysés pendant le scraping
+LINK_QUEUE_SIZE = 100      # liens en attente entre le scraper et le téléchargement
+LLM_BACKLOG = 2 * MAX_CONCURRENCY   # offres parsées en attente du LLM avant de ralentir l'amont
+PIPELINE_LINKS_CSV = True  # écrit aussi actiris_detail_links.csv à la fin du scraping
+# profil comparé aux offres (partagé avec LinkedinJobs)
+USER_CONTEXT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LinkedinJobs", "user_context.txt")
 
-# --- Fonctions utilitaires ---
+tokens_lock = threading.Lock()
+tokens_saved = {"before": 0, "after": 0}
+if not PARSE_WORKER:
+    llm_cache = LLMCache()
+    # appels LM Studio simultanés, ajustés à ce que le modèle chargé supporte
+    dispatcher = AdaptiveDispatcher(max_limit=MAX_CONCURRENCY, name="actiris-llm")
+    # rejet d'office, noté NON "prefilter" dans le registre
+    prefilter = PreFilter.from_file()
+    # verdict repris d'une offre déjà jugée, noté "near-duplicate" dans le registre
+    near_duplicates = NearDuplicateIndex()
 
-def parse_offer_page(url):
-    """Récupère les informations d'une offre Actiris depuis sa page HTML."""
-    headers = {"User-Agent": "Mozilla/5.0"}
-    res = requests.get(url, headers=headers)
-    res.raise_for_status()
-    soup = BeautifulSoup(res.text, "html.parser")
-
-    # Titre (si présent dans une balise <h1>, adapter si différent)
-    title_tag = soup.select_one("h1")
-    title = title_tag.get_text(strip=True) if title_tag else "Titre non trouvé"
-
-    # Infos générales (type de contrat, temps de travail, famille métier)
-    info_items = soup.select("ul.picto li")
-    contract_type = work_time = job_family = ""
-
-    for li in info_items:
-        text = li.get_text(strip=True)
-        if "Temps de travail" in text:
-            work_time = text.replace("Temps de travail :", "").strip()
-        elif "Type de contrat" in text:
-            contract_type = text.replace("Type de contrat :", "").strip()
-        elif "Famille de métiers" in text:
-            job_family = text.replace("Famille de métiers :", "").strip()
-
-    # Description complète : bloc principal
-    description_block = soup.select_one("div.bloc-emploi__text")
-    description = description_block.get_text("\n", strip=True) if description_block else ""
-
-    # Profil recherché : sous-titre + liste
-    profile = ""
-    profile_heading = soup.find("h3", string="Profil")
-    if profile_heading:
-        ul = profile_heading.find_next_sibling("ul")
-        if ul:
-            profile = "\n".join(li.get_text(strip=True) for li in ul.find_all("li"))
-
-    # Compétences linguistiques
-    languages = []
-    lang_section = soup.find("h3", string="Compétences linguistiques")
-    if lang_section:
-        for lang_block in lang_section.find_all_next("li"):
-            lang_name = lang_block.find("h4")
-            if lang_name:
-                levels = [li.get_text(strip=True) for li in lang_block.find_all("li")]
-                languages.append({"langue": lang_name.text.strip(), "niveaux": levels})
-            if lang_block.find_next("h3"):  # stop at next section
-                break
-
-    # Lien vers Panorama des métiers (si disponible)
-    panorama_link = ""
-    panorama_anchor = soup.find("a", href=True, string="Panorama des métiers")
-    if panorama_anchor:
-        panorama_link = panorama_anchor["href"]
-
-    return {
-        "url": url,
-        "title": title,
-        "contract_type": contract_type,
-        "work_time": work_time,
-        "job_family": job_family,
-        "description": description,
-        "profile": profile,
-        "languages": languages,
-        "panorama_link": panorama_link
-    }
-
-def ask_gpt_oss(offer):
-    
-    # ****************************************************
-    # Contexte utilisateur envoyé au LLM
-    # Le contexte doit absoulment renvoyer NON ou OUI à la fin, dans la première ligne du prompt
-    # ****************************************************
+# --- Fonctions utilitaires ---
 
-    prompt = f"""
+def raw_prompt(offer):
+    """Prompt historique (tous les champs bruts), sert de référence pour mesurer l'économie de tokens."""
+    return f"""
 Offre à analyser :
 
 Titre : {offer['title']}
@@ -99,18 +85,85 @@ Compétences linguistiques : {offer['languages']}
 Panorama des métiers : {offer['panorama_link']}
 """
 
-    try:
+def format_languages(languages):
+    return " ; ".join(f"{l['langue']} ({', '.join(l['niveaux'])})" if l.get("niveaux") else l["langue"]
+                      for l in languages)
+
+def build_prompt(offer):
+
+    # ****************************************************
+    # Contexte utilisateur envoyé au LLM
+    # Le contexte doit absoulment renvoyer NON ou OUI à la fin, dans la première ligne du prompt
+    # ****************************************************
+
+    # Fiche compacte : texte nettoyé, sans doublons ni lien Panorama, dans le budget de tokens
+    fields = compact_fields({
+        "Titre": offer["title"],
+        "Type de contrat": offer["contract_type"],
+        "Temps de travail": offer["work_time"],
+        "Famille de métiers": offer["job_family"],
+        "Description": offer["description"],
+        "Profil recherché": offer["profile"],
+        "Compétences linguistiques": format_languages(offer["languages"]),
+    }, long_field="Description", budget=PROMPT_TOKEN_BUDGET)
+    lines = "\n".join(f"{key} : {value}" for key, value in fields.items())
+    return f"""
+Offre à analyser :
+
+{lines}
+"""
+
+def build_messages(prompt):
+    """
+    PROMPT_LAYOUT = "system" : profil utilisateur en message système, identique à chaque
+    appel (préfixe réutilisé par le cache KV de LM Studio), fiche d'offre en dernier.
+    Sinon, la fiche seule (le contexte vient alors du preset chargé dans LM Studio).
+    """
+    return chat_messages(SYSTEM_CONTEXT if PROMPT_LAYOUT == "system" else "", prompt)
+
+def complete(messages, oui_mode):
+    """Appel LM Studio ; en streaming, s'arrête dès que la décision le permet. Renvoie (texte, complet)."""
+    if not STREAM_DECISION:
         response = client.chat.completions.create(
             model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=512,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
             stop=["FIN"],
         )
-        text = response.choices[0].message.content
+        return response.choices[0].message.content, True
+
+    stream = client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=messages,
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS,
+        stop=["FIN"],
+        stream=True,
+    )
+    return read_until_decision(chat_deltas(stream), stream.close, oui_mode, dispatcher.mark_decision)
+
+def ask_gpt_oss(offer, oui_mode=OUI_MODE):
+    prompt = build_prompt(offer)
+    report = token_report(raw_prompt(offer), prompt)
+    with tokens_lock:
+        tokens_saved["before"] += report["before"]
+        tokens_saved["after"] += report["after"]
+    print(f"  ✂️ prompt {offer['url']} : {report['before']} → {report['after']} tokens (-{report['saved']})")
+
+    try:
+        messages = build_messages(prompt)
+        cache_key = make_key(messages, MODEL_NAME, temperature=TEMPERATURE, max_tokens=MAX_TOKENS)
+        text, _, hit = cached_call(llm_cache, cache_key, lambda: dispatcher.call(complete, messages, oui_mode),
+                                   MODEL_NAME)
+        if hit:
+            print("  (réponse LLM servie depuis le cache)")
 
-        # decision = first 3 char of the response in the first line
-        decision = text.splitlines()[0][:3].strip()
+        text = text.strip()
+        decision = decision_of(text)
+        if decision is None:
+            print(f"  Réponse GPT-OSS vide ou hors format ({offer['url']}) : {text[:80]!r}")
+            return False, "Réponse illisible"
         # justification = rest of the response but without the first line
         justification = "\n".join(text.splitlines()[1:]).strip()
 
@@ -122,41 +175,246 @@ Panorama des métiers : {offer['panorama_link']}
 
 # --- Traitement principal ---
 
-def main():
-    with open("actiris_detail_links.csv", newline="", encoding="utf-8") as f:
+def load_filtered_urls(path=FILTERED_PATH):
+    """URLs déjà présentes dans le CSV des offres retenues (évite les doublons)."""
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            return {row[0] for row in csv.reader(f) if row}
+    except FileNotFoundError:
+        return set()
+
+def load_links(path=None):
+    with open(path or scrap_actiris.LINKS_PATH, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
-        urls = [row["detail_url"] for row in reader]
+        return [row["detail_url"] for row in reader]
 
-    filtered = []
-    for i, url in enumerate(urls, 1):
-        print(f"[{i}/{len(urls)}] Analyse de {url}")
-        try:
-            offer = parse_offer_page(url)
-        except Exception as e:
-            print("  Erreur parsing :", e)
-            time.sleep(10)  # pour ne pas inonder le site
-            continue
+def scraped_links():
+    """Liens d'offres au fil du scraping (file bornée : le scraper attend si l'analyse prend du retard)."""
+    links = queue.Queue(maxsize=LINK_QUEUE_SIZE)
 
+    def produce():
         try:
-            decision, justification = ask_gpt_oss(offer)
+            scrap_actiris.scrape(on_links=lambda page_links: [links.put(url) for url in page_links],
+                                 links_path=scrap_actiris.LINKS_PATH if PIPELINE_LINKS_CSV else None)
         except Exception as e:
-            print("  Erreur GPT-OSS :", e)
-            continue
+            print("⚠️ Erreur scraping :", e)
+        finally:
+            links.put(None)
+
+    threading.Thread(target=produce, daemon=True, name="scraper").start()
+    while True:
+        url = links.get()
+        if url is None:
+            return
+        yield url
+
+def main(pipeline=False):
+    # processus de parsing démarrés avant tout autre thread (fork sans verrou pris)
+    engine = ExtractionEngine()
+    # Reprise : on saute les offres déjà présentes dans le registre
+    ledger = Ledger()
+    model_filter = MODEL_NAME if REANALYZE_ON_MODEL_CHANGE else None
+    if pipeline:
+        todo = (url for url in scraped_links() if not ledger.is_done(url, model_filter))
+        total = "?"
+        print("🔀 Mode pipeline : analyse des offres pendant le scraping.")
+    else:
+        urls = load_links()
+        todo = [url for url in urls if not ledger.is_done(url, model_filter)]
+        total = len(todo)
+        print(f"📒 {len(urls) - len(todo)} offres déjà analysées, {len(todo)} à traiter.")
+
+    # Téléchargement en parallèle (débit poli par hôte, backoff exponentiel en
+    # cas d'erreur), parsing dans un pool de processus séparé, analyses LLM
+    # concurrentes bornées par le dispatcher adaptatif.
+    fetcher = Fetcher(cache=HttpCache())
+    llm_pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY)
+    already_filtered = load_filtered_urls()
+    retained = 0
+    pending = {}
+    screen = RelevanceScreen(client, context_text=load_user_context(), namespace="actiris") if EMBED_SCREEN else None
+    screen_batch = []
+
+    with open(FILTERED_PATH, "a", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=["url", "justification"])
+
+        def checkpoint(fut):
+            """Enregistre le verdict d'une offre dès qu'il est connu : ligne CSV puis registre."""
+            url, offer = pending.pop(fut)
+            try:
+                decision, justification = fut.result()
+            except Exception as e:
+                print(f"  Erreur GPT-OSS ({url}) :", e)
+                return
+            if decision is False:
+                # erreur LLM : l'offre sera retentée au prochain lancement
+                return
+            settle(url, offer, decision, justification, MODEL_NAME)
+            near_duplicates.add(url, offer_fingerprint(offer), "actiris", url, offer["title"], decision, justification)
+
+        def settle(url, offer, decision, justification, model):
+            nonlocal retained
+            if decision == "OUI":
+                print(f"  → RETENU ({url}) :", justification)
+                if url not in already_filtered:
+                    writer.writerow({"url": url, "justification": justification})
+                    out.flush()
+                retained += 1
+                if screen is not None:
+                    screen.add_reference(embedding_text(offer))
+            else:
+                print(f"  → IGNORÉ ({url}) :", justification)
+            ledger.record(url, decision, justification, model)
+
+        def submit_screened(batch):
+            """Classe un lot d'offres par similarité ; seules les meilleures vont au LLM."""
+            try:
+                keep, scores = screen.select_top([embedding_text(o) for _, o in batch], EMBED_KEEP_FRACTION)
+            except Exception as e:
+                print("  Erreur embeddings (lot envoyé entier au LLM) :", e)
+                keep, scores = range(len(batch)), None
+            keep = set(keep)
+            forced = 0
+            for j, (url, offer) in enumerate(batch):
+                if j in keep:
+                    pending[llm_pool.submit(ask_gpt_oss, offer)] = (url, offer)
+                elif scores[j] < EMBED_MIN_SCORE:
+                    print(f"  → IGNORÉ ({url}) : score embeddings {scores[j]:.3f}")
+                    ledger.record(url, "NON", f"Pré-sélection embeddings : score {scores[j]:.3f}", "embedding-screen")
+                elif ledger.deferrals(url) >= EMBED_MAX_DEFERRALS:
+                    print(f"  → envoyée au LLM après {EMBED_MAX_DEFERRALS} reports ({url})")
+                    pending[llm_pool.submit(ask_gpt_oss, offer)] = (url, offer)
+                    forced += 1
+                else:
+                    # écartée par la fraction du lot seulement : pas de verdict définitif
+                    n = ledger.defer(url, f"score embeddings {scores[j]:.3f}")
+                    print(f"  → REPORTÉ ({url}) : score embeddings {scores[j]:.3f} (hors des meilleures du lot, "
+                          f"report {n}/{EMBED_MAX_DEFERRALS})")
+            print(f"  🔎 Pré-sélection : {len(keep) + forced}/{len(batch)} offres envoyées au LLM")
 
-        if decision == "OUI":
-            print("  → RETENU :", justification)
-            filtered.append({"url": url, "justification": justification})
-        else:
-            print("  → IGNORÉ :", justification)
+        for i, (url, parsing, error) in enumerate(fetcher.map(todo, engine.submit), 1):
+            print(f"[{i}/{total}] Analyse de {url}")
+            try:
+                if error is not None:
+                    raise error
+                offer = parsing.result()
+            except Exception as e:
+                print("  Erreur parsing :", e)
+                continue
 
-        time.sleep(1)  # pour ne pas inonder l'API
+            rule = prefilter.check(offer)
+            if rule:
+                print(f"  → IGNORÉ (pré-filtre : {rule})")
+                ledger.record(url, "NON", f"Pré-filtre : {rule}", "prefilter")
+                continue
 
-    # Sauvegarde des offres retenues sans supprimer les précédentes
-    with open("filtered_offers.csv", "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["url", "justification"])
-        writer.writerows(filtered)
+            fp = offer_fingerprint(offer)
+            original = near_duplicates.find(fp, offer["title"], exclude=url)
+            if original is not None:
+                print(f"  ♻️ Doublon de {original['link']} ({original['source']}) : verdict réutilisé")
+                settle(url, offer, original["decision"], original["justification"] or "", "near-duplicate")
+                near_duplicates.add(url, fp, "actiris", url, offer["title"], original["decision"],
+                                    original["justification"], duplicate_of=original["offer_id"])
+                continue
+
+            if screen is not None:
+                screen_batch.append((url, offer))
+                if len(screen_batch) >= EMBED_SCREEN_BATCH:
+                    submit_screened(screen_batch)
+                    screen_batch = []
+            else:
+                pending[llm_pool.submit(ask_gpt_oss, offer)] = (url, offer)
+            # au-delà de LLM_BACKLOG offres en attente, on attend le LLM (le téléchargement
+            # et le scraping ralentissent d'autant grâce aux files bornées)
+            done, _ = wait(list(pending), timeout=None if len(pending) >= LLM_BACKLOG else 0,
+                           return_when=FIRST_COMPLETED)
+            for fut in done:
+                checkpoint(fut)
+
+        if screen_batch:
+            submit_screened(screen_batch)
+        for fut in as_completed(list(pending)):
+            checkpoint(fut)
+
+    llm_pool.shutdown()
+    print("\n🧹 Pré-filtre : " + prefilter.summary())
+    print(dispatcher.describe())
+    c = fetcher.counters
+    print(f"\n🌐 Pages : {c['network']} téléchargées, {c['not_modified']} inchangées (304), {c['disk']} servies depuis le cache.")
+    fetcher.close()
+    engine.close()
+    ledger.close()
+    if screen is not None:
+        screen.close()
+    print(f"♻️ Quasi-doublons : {near_duplicates.hits} verdicts réutilisés sans LLM.")
+    near_duplicates.close()
+    print(f"🧠 Cache LLM : {llm_cache.hits} hits, {llm_cache.misses} appels au modèle.")
+    print(f"✂️ Prompts : {tokens_saved['before']} → {tokens_saved['after']} tokens "
+          f"({tokens_saved['before'] - tokens_saved['after']} économisés).")
+
+    print(f"\n✅ {retained} offres retenues, enregistrées dans '{FILTERED_PATH}'.")
+
+def offer_fingerprint(offer):
+    return fingerprint(offer["title"], "\n".join([offer["description"] or "", offer["profile"] or ""]))
+
+def embedding_text(offer):
+    return offer_text({
+        "Titre": offer["title"],
+        "Type de contrat": offer["contract_type"],
+        "Famille de métiers": offer["job_family"],
+        "Description": offer["description"],
+        "Profil recherché": offer["profile"],
+    }, long_field="Description")
+
+def load_user_context(path=USER_CONTEXT_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+SYSTEM_CONTEXT = "" if PARSE_WORKER else stable_context(load_user_context())
+
+def justify_pending():
+    """Génère les justifications différées (OUI_MODE = "defer") des offres retenues."""
+    with open(FILTERED_PATH, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.reader(f) if row]
+    missing = [row[0] for row in rows if len(row) < 2 or not row[1].strip()]
+    print(f"📝 {len(missing)} justifications à générer.")
+    if not missing:
+        return
+
+    fetcher = Fetcher(cache=HttpCache())
+    ledger = Ledger()
+    justifications = {}
+    for url, offer, error in fetcher.map(missing, parse_offer_html):
+        if error is not None:
+            print(f"  Erreur parsing ({url}) :", error)
+            continue
+        decision, justification = ask_gpt_oss(offer, oui_mode="continue")
+        if decision is False:
+            continue
+        justifications[url] = justification
+        ledger.record(url, decision, justification, MODEL_NAME)
+        print(f"  → {url} :", justification)
+    fetcher.close()
+    ledger.close()
 
-    print(f"\n✅ {len(filtered)} offres retenues, enregistrées dans 'filtered_offers.csv'.")
+    tmp = FILTERED_PATH + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow([row[0], justifications.get(row[0], row[1] if len(row) > 1 else "")])
+    os.replace(tmp, FILTERED_PATH)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Analyse des offres Actiris avec LM Studio.")
+    parser.add_argument("--justify", action="store_true",
+                        help="génère les justifications différées des offres retenues")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="lance le scraping et analyse les offres au fur et à mesure")
+    args = parser.parse_args()
+    if args.justify:
+        justify_pending()
+    else:
+        main(pipeline=args.pipeline)
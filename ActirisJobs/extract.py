@@ -0,0 +1,377 @@
+# extract.py
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# *********************
+# Extraction des champs d'une offre Actiris depuis le HTML.
+# Backends : selectolax (le plus rapide), BeautifulSoup + lxml, BeautifulSoup +
+# html.parser. Avec BeautifulSoup, seuls les sous-arbres utiles sont construits,
+# conteneurs de sections compris : les listes qui suivent un h3 sont cherchées
+# parmi ses vrais frères, pas dans le pied de page.
+#   python extract.py --check [page.html ...]   (compare les backends installés)
+# *********************
+
+PARSER_BACKEND = "auto"   # "auto", "selectolax", "lxml" ou "html.parser"
+PARSE_PROCESSES = max(1, (os.cpu_count() or 2) // 2)  # 1 = parsing dans les threads I/O
+# "fork" sous Linux (processus créés dans ExtractionEngine(), avant les threads I/O),
+# "spawn" ailleurs (le script principal est réimporté : rien de lourd à l'import)
+PARSE_START_METHOD = "fork" if sys.platform.startswith("linux") else "spawn"
+
+PANORAMA_TEXT = "Panorama des métiers"
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+def resolve_backend(backend=PARSER_BACKEND):
+    """Choisit le backend disponible le plus rapide si `backend` vaut "auto"."""
+    if backend == "auto":
+        if HTMLParser is not None:
+            return "selectolax"
+        return "lxml" if HAS_LXML else "html.parser"
+    if backend == "selectolax" and HTMLParser is None:
+        raise ImportError("selectolax n'est pas installé")
+    if backend == "lxml" and not HAS_LXML:
+        raise ImportError("lxml n'est pas installé")
+    return backend
+
+
+def _split_info(texts):
+    """Répartit les lignes de `ul.picto` en (type de contrat, temps de travail, famille de métiers)."""
+    contract_type = work_time = job_family = ""
+    for text in texts:
+        if "Temps de travail" in text:
+            work_time = text.replace("Temps de travail :", "").strip()
+        elif "Type de contrat" in text:
+            contract_type = text.replace("Type de contrat :", "").strip()
+        elif "Famille de métiers" in text:
+            job_family = text.replace("Famille de métiers :", "").strip()
+    return contract_type, work_time, job_family
+
+
+def _offer(url, title, info_texts, description, profile, languages, panorama_link):
+    contract_type, work_time, job_family = _split_info(info_texts)
+    return {
+        "url": url,
+        "title": title or "Titre non trouvé",
+        "contract_type": contract_type,
+        "work_time": work_time,
+        "job_family": job_family,
+        "description": description,
+        "profile": profile,
+        "languages": languages,
+        "panorama_link": panorama_link
+    }
+
+
+# --- BeautifulSoup ---
+
+# conteneurs gardés entiers : un h3 y reste à côté de ses propres listes
+SECTION_TAGS = ("main", "article", "section", "div")
+
+
+def _wanted_tag(name, attrs=None):
+    """Seuls ces éléments (et leur sous-arbre) sont construits par BeautifulSoup."""
+    return name in ("h1", "h3", "ul", "a") or name in SECTION_TAGS
+
+
+class _OfferStrainer(SoupStrainer):
+    """
+    bs4 < 4.13 appelle la fonction `name` avec (nom, attributs) ; bs4 >= 4.13 ne
+    lui passe que le nom, d'où la surcharge de `allow_tag_creation`.
+    """
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return _wanted_tag(name, attrs)
+
+
+OFFER_STRAINER = _OfferStrainer(_wanted_tag)
+
+
+def _parse_bs4(url, html, parser):
+    soup = BeautifulSoup(html, parser, parse_only=OFFER_STRAINER)
+
+    title_tag = soup.find("h1")
+    title = title_tag.get_text(strip=True) if title_tag else ""
+
+    info_texts = [li.get_text(strip=True) for li in soup.select("ul.picto li")]
+
+    description_block = soup.select_one("div.bloc-emploi__text")
+    description = description_block.get_text("\n", strip=True) if description_block else ""
+
+    profile = ""
+    profile_heading = soup.find("h3", string="Profil")
+    if profile_heading:
+        ul = profile_heading.find_next_sibling("ul")
+        if ul:
+            profile = "\n".join(li.get_text(strip=True) for li in ul.find_all("li"))
+
+    # Compétences linguistiques : uniquement les frères entre ce h3 et le suivant
+    languages = []
+    lang_section = soup.find("h3", string="Compétences linguistiques")
+    if lang_section:
+        for sibling in lang_section.find_next_siblings():
+            if sibling.name == "h3":
+                break
+            if sibling.name != "ul":
+                continue
+            for lang_block in sibling.find_all("li", recursive=False):
+                lang_name = lang_block.find("h4", recursive=False)
+                if lang_name:
+                    levels = [li.get_text(strip=True) for li in lang_block.find_all("li")]
+                    languages.append({"langue": lang_name.get_text(strip=True), "niveaux": levels})
+
+    panorama_link = ""
+    panorama_anchor = soup.find("a", href=True, string=PANORAMA_TEXT)
+    if panorama_anchor:
+        panorama_link = panorama_anchor["href"]
+
+    return _offer(url, title, info_texts, description, profile, languages, panorama_link)
+
+
+# --- selectolax ---
+
+def _text(node, separator=""):
+    """Comme `get_text(separator, strip=True)` de BeautifulSoup : textes non vides, nettoyés par str.strip."""
+    texts = (n.text(deep=False).strip() for n in node.traverse(include_text=True)
+             if n.tag == "-text" and n.parent is not None and n.parent.tag not in ("script", "style"))
+    return separator.join(t for t in texts if t)
+
+def _string(node):
+    """Comme `.string` de BeautifulSoup : texte d'un nœud à enfant unique (récursivement), sinon None."""
+    children = list(node.iter(include_text=True))
+    if len(children) != 1:
+        return None
+    child = children[0]
+    return child.text(deep=False) if child.tag == "-text" else _string(child)
+
+def _children(node, tag):
+    return [child for child in node.iter() if child.tag == tag]
+
+def _descendants(node, tag):
+    # selon la version, css() peut inclure le nœud lui-même
+    return [el for el in node.css(tag) if el.mem_id != node.mem_id]
+
+def _heading(tree, text):
+    for h3 in tree.css("h3"):
+        if _string(h3) == text:
+            return h3
+    return None
+
+def _next_element(node):
+    node = node.next
+    while node is not None and node.tag in ("-text", "_comment"):
+        node = node.next
+    return node
+
+def _parse_selectolax(url, html):
+    tree = HTMLParser(html)
+
+    title_tag = tree.css_first("h1")
+    title = _text(title_tag) if title_tag else ""
+
+    info_texts = [_text(li) for li in tree.css("ul.picto li")]
+
+    description_block = tree.css_first("div.bloc-emploi__text")
+    description = _text(description_block, "\n") if description_block else ""
+
+    profile = ""
+    profile_heading = _heading(tree, "Profil")
+    if profile_heading:
+        sibling = _next_element(profile_heading)
+        while sibling is not None and sibling.tag != "ul":
+            sibling = _next_element(sibling)
+        if sibling is not None:
+            profile = "\n".join(_text(li) for li in _descendants(sibling, "li"))
+
+    languages = []
+    lang_section = _heading(tree, "Compétences linguistiques")
+    if lang_section:
+        sibling = _next_element(lang_section)
+        while sibling is not None and sibling.tag != "h3":
+            if sibling.tag == "ul":
+                for lang_block in _children(sibling, "li"):
+                    lang_name = _children(lang_block, "h4")
+                    if lang_name:
+                        levels = [_text(li) for li in _descendants(lang_block, "li")]
+                        languages.append({"langue": _text(lang_name[0]), "niveaux": levels})
+            sibling = _next_element(sibling)
+
+    panorama_link = ""
+    for a in tree.css("a[href]"):
+        if _string(a) == PANORAMA_TEXT:
+            panorama_link = a.attributes.get("href") or ""
+            break
+
+    return _offer(url, title, info_texts, description, profile, languages, panorama_link)
+
+
+def parse_offer_html(url, html, backend=PARSER_BACKEND):
+    """Extrait les informations d'une offre Actiris depuis le HTML déjà téléchargé."""
+    backend = resolve_backend(backend)
+    if backend == "selectolax":
+        return _parse_selectolax(url, html)
+    return _parse_bs4(url, html, backend)
+
+
+class ExtractionEngine:
+    """
+    Parse les pages dans un pool de processus distinct des threads I/O,
+    pour que le parsing (CPU) d'un gros lot ne soit plus sérialisé par le GIL.
+    À créer avant de lancer des threads : en "fork", tous les processus sont
+    créés ici, pas au premier `submit` depuis un thread de téléchargement
+    (un fork pendant qu'un autre thread tient un verrou peut bloquer l'enfant).
+    """
+
+    def __init__(self, backend=PARSER_BACKEND, processes=PARSE_PROCESSES, start_method=PARSE_START_METHOD):
+        self.backend = resolve_backend(backend)
+        self.pool = None
+        if processes > 1:
+            self.pool = ProcessPoolExecutor(max_workers=processes,
+                                            mp_context=multiprocessing.get_context(start_method))
+            # premier envoi : en "fork", lance tous les processus maintenant
+            self.pool.submit(resolve_backend, self.backend).result()
+
+    def submit(self, url, html):
+        """Lance le parsing de `html` ; renvoie un Future dont le résultat est l'offre."""
+        if self.pool is not None:
+            return self.pool.submit(parse_offer_html, url, html, self.backend)
+        fut = Future()
+        try:
+            fut.set_result(parse_offer_html(url, html, self.backend))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+# --- Comparaison des backends ---
+
+SAMPLE_OFFER_HTML = """<html><head><title>Offre</title><script>var x = 1;</script></head><body>
+<header><nav><ul><li><a href="/">Accueil</a></li></ul></nav></header>
+<main><div class="offre">
+<h1>Développeur Python (H/F)</h1>
+<ul class="picto"><li>Type de contrat : CDI</li><li>Temps de travail : Temps plein</li>
+<li>Famille de métiers : Informatique</li></ul>
+<div class="bloc-emploi__text"><p>Développement d'applications web.</p><p>Équipe de 5 personnes.</p></div>
+<div class="bloc-emploi"><h3>Profil</h3><ul><li>Bachelier en informatique</li><li>3 ans d'expérience</li></ul></div>
+<div class="bloc-emploi"><h3>Compétences linguistiques</h3>
+<ul><li><h4>Français</h4><ul><li>Très bonne connaissance</li></ul></li>
+<li><h4>Anglais</h4><ul><li>Bonne connaissance</li></ul></li></ul></div>
+<p><a href="https://www.actiris.brussels/panorama">Panorama des métiers</a></p>
+</div></main>
+<footer><ul><li><h4>Contact</h4><ul><li>02 505 79 15</li></ul></li></ul></footer>
+</body></html>"""
+
+
+# même offre, mise en forme désordonnée : espaces, &nbsp;, lignes vides, commentaires, script
+SAMPLE_MESSY_OFFER_HTML = """<html><body>
+<main>
+  <h1>
+     Développeur   Python (H/F)
+  </h1>
+  <ul class="picto">
+    <li>
+      Type de contrat :   CDI </li>
+    <li>Temps de travail : <b>Temps plein</b></li>
+    <li>Famille de métiers : Informatique&nbsp;</li>
+  </ul>
+  <div class="bloc-emploi__text">
+     <p>  Développement   d'applications
+     web. </p>
+
+     <!-- bloc vide -->
+     <p>&nbsp;</p><script>var suivi = 1;</script>
+     <ul><li> Équipe de 5 personnes </li><li>Télétravail<br>partiel</li></ul>
+     Texte libre <b>gras</b> suite.
+     <p>   </p>
+  </div>
+  <div class="bloc-emploi">
+    <h3>Profil</h3>
+
+    <ul>
+      <li> Bachelier en informatique </li>
+      <li>3 ans d'expérience</li>
+    </ul>
+  </div>
+  <div class="bloc-emploi">
+    <h3>Compétences linguistiques</h3>
+    <ul>
+      <li>
+        <h4> Français </h4>
+        <ul><li> Très bonne connaissance </li></ul>
+      </li>
+      <li><h4>Anglais</h4><ul><li>Bonne connaissance</li></ul></li>
+    </ul>
+  </div>
+  <p><a href="/autre"> Panorama des métiers </a>
+     <a href="https://www.actiris.brussels/panorama"><span>Panorama des métiers</span></a></p>
+</main>
+<footer><ul><li><h4>Contact</h4><ul><li>02 505 79 15</li></ul></li></ul></footer>
+</body></html>"""
+
+SAMPLES = {"exemple": SAMPLE_OFFER_HTML, "exemple-espaces": SAMPLE_MESSY_OFFER_HTML}
+
+
+def available_backends():
+    return [b for b, ok in (("selectolax", HTMLParser is not None), ("lxml", HAS_LXML), ("html.parser", True)) if ok]
+
+
+def compare_backends(html, url="sample"):
+    """Offre extraite par chaque backend installé ; renvoie (offres, champs qui diffèrent)."""
+    offers = {backend: parse_offer_html(url, html, backend) for backend in available_backends()}
+    reference = next(iter(offers.values()))
+    differing = sorted({key for offer in offers.values() for key in offer if offer[key] != reference[key]})
+    return offers, differing
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Extraction des offres Actiris.")
+    parser.add_argument("--check", nargs="*", metavar="PAGE",
+                        help="compare les backends sur une page d'exemple (ou sur ces fichiers HTML)")
+    args = parser.parse_args()
+    if args.check is None:
+        parser.print_help()
+        sys.exit(0)
+
+    pages = dict(SAMPLES)
+    for path in args.check:
+        with open(path, "r", encoding="utf-8") as f:
+            pages[path] = f.read()
+    failed = False
+    for name, html in pages.items():
+        offers, differing = compare_backends(html, name)
+        if name in SAMPLES:
+            languages = [l["langue"] for l in next(iter(offers.values()))["languages"]]
+            if languages != ["Français", "Anglais"]:
+                differing.append(f"languages = {languages}")
+        if differing:
+            failed = True
+            print(f"❌ {name} : {', '.join(differing)}")
+            for backend, offer in offers.items():
+                print(f"   {backend:<11} {[(k, offer[k]) for k in differing if k in offer]}")
+        else:
+            print(f"✅ {name} : {', '.join(offers)} identiques")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,195 @@
+# fetcher.py
+
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# *********************
+# Étape de téléchargement partagée : session keep-alive + pool de connexions,
+# concurrence bornée, limiteur de débit par hôte et backoff exponentiel.
+# Le limiteur est commun à tous les Fetcher du processus (chargeurs du crawl,
+# téléchargement des offres en mode pipeline) : RATE_PER_HOST vaut au total.
+# *********************
+
+USER_AGENT = "Mozilla/5.0"
+FETCH_WORKERS = 6            # requêtes HTTP simultanées au maximum
+RATE_PER_HOST = 2.0          # requêtes / seconde autorisées par hôte
+BURST_PER_HOST = 4           # rafale maximale tolérée par hôte
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0           # secondes, doublé à chaque tentative
+BACKOFF_MAX = 30.0
+REQUEST_TIMEOUT = 20
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Seau à jetons thread-safe : `rate` jetons par seconde, `capacity` au plus."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Bloque jusqu'à obtenir un jeton."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """Un seau à jetons par hôte, créé à la demande."""
+
+    def __init__(self, rate=RATE_PER_HOST, burst=BURST_PER_HOST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+
+# limiteur partagé par défaut entre tous les Fetcher
+shared_limiter = HostRateLimiter()
+
+
+def make_session(pool_size=FETCH_WORKERS):
+    """Session requests réutilisable (keep-alive) dimensionnée pour le pool de threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Délai avant la tentative suivante (Retry-After prioritaire, sinon exponentiel + jitter)."""
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    return delay * (0.5 + random.random() / 2)
+
+
+class Fetcher:
+    """Télécharge des pages en respectant le débit par hôte, avec retries exponentiels."""
+
+    def __init__(self, session=None, limiter=None, workers=FETCH_WORKERS, cache=None):
+        self.workers = workers
+        self.session = session or make_session(workers)
+        self.limiter = limiter or shared_limiter
+        self.cache = cache
+        self.counters = {"network": 0, "not_modified": 0, "disk": 0}
+        self.counters_lock = threading.Lock()
+
+    def _count(self, key):
+        with self.counters_lock:
+            self.counters[key] += 1
+
+    def fetch(self, url):
+        """Renvoie le HTML de `url` ; lève la dernière erreur si toutes les tentatives échouent."""
+        cached = self.cache.lookup(url) if self.cache else None
+        if cached:
+            body, conditional_headers, fresh = cached
+            if fresh:
+                self._count("disk")
+                return body
+        else:
+            body, conditional_headers = None, {}
+
+        last_error = None
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire(url)
+            try:
+                res = self.session.get(url, headers=conditional_headers, timeout=REQUEST_TIMEOUT)
+                if res.status_code == 304 and body is not None:
+                    self.cache.revalidated(url)
+                    self._count("not_modified")
+                    return body
+                if res.status_code in RETRY_STATUS:
+                    last_error = requests.HTTPError(f"HTTP {res.status_code}", response=res)
+                    retry_after = res.headers.get("Retry-After")
+                else:
+                    res.raise_for_status()
+                    self._count("network")
+                    if self.cache:
+                        self.cache.store(url, res.text, res.headers)
+                    return res.text
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                retry_after = None
+            if attempt < MAX_RETRIES:
+                time.sleep(backoff_delay(attempt, retry_after))
+        raise last_error
+
+    def map(self, urls, func, max_pending=None):
+        """
+        Applique `func(url, html)` à chaque page téléchargée, `workers` à la fois.
+        `urls` est lu au fil de l'eau (il peut s'agir d'une file alimentée par le
+        scraper) ; au plus `max_pending` pages sont en cours ou en attente d'être
+        consommées, ce qui ralentit la lecture de `urls` si l'aval n'avance plus.
+        Génère des tuples (url, résultat, erreur) dans l'ordre d'arrivée.
+        """
+        slots = threading.Semaphore(max_pending or self.workers * 4)
+        results = queue.Queue()
+        fed = []
+
+        def task(url):
+            try:
+                results.put((url, func(url, self.fetch(url)), None))
+            except Exception as e:
+                results.put((url, None, e))
+
+        def feed(pool):
+            n = 0
+            try:
+                for url in urls:
+                    slots.acquire()
+                    pool.submit(task, url)
+                    n += 1
+            except Exception as e:
+                print("  Erreur source d'URLs :", e)
+            finally:
+                fed.append(n)
+                results.put(None)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            feeder = threading.Thread(target=feed, args=(pool,), daemon=True, name="fetch-feeder")
+            feeder.start()
+            received = 0
+            while not fed or received < fed[0]:
+                item = results.get()
+                if item is None:
+                    continue
+                received += 1
+                slots.release()
+                yield item
+
+    def close(self):
+        self.session.close()
+        if self.cache:
+            self.cache.close()
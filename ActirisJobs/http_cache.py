@@ -0,0 +1,142 @@
+# http_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# *********************
+# Cache HTTP sur disque pour les pages d'offres.
+# Les corps sont stockés par empreinte SHA-256 (content-addressed), l'index
+# SQLite garde ETag / Last-Modified pour la revalidation conditionnelle et
+# l'heure du dernier accès pour l'éviction LRU.
+# *********************
+
+CACHE_DIR = "http_cache"
+CACHE_MAX_BYTES = 200 * 1024 * 1024   # taille maximale des corps stockés
+CACHE_FRESH_SECONDS = 6 * 3600        # servi sans revalidation pendant ce délai
+
+
+class HttpCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, fresh_seconds=CACHE_FRESH_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self.db.executescript('''
+        CREATE TABLE IF NOT EXISTS entries (
+            url TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at);
+        CREATE INDEX IF NOT EXISTS idx_entries_digest ON entries(digest);
+        ''')
+        self.db.commit()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _read_blob(self, digest):
+        try:
+            with open(self._blob_path(digest), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def lookup(self, url):
+        """
+        Renvoie (corps, en_têtes_conditionnels, frais) ou None si absent.
+        `frais` indique que l'entrée peut être servie sans revalidation.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT digest, etag, last_modified, fetched_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            if not row:
+                return None
+            digest, etag, last_modified, fetched_at = row
+            body = self._read_blob(digest)
+            if body is None:
+                # blob disparu : on oublie l'entrée
+                self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self.db.commit()
+                return None
+            self.db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self.db.commit()
+
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        fresh = (time.time() - fetched_at) < self.fresh_seconds
+        return body, headers, fresh
+
+    def revalidated(self, url):
+        """Le serveur a répondu 304 : l'entrée redevient fraîche."""
+        now = time.time()
+        with self.lock:
+            self.db.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self.db.commit()
+
+    def store(self, url, body, headers):
+        """Enregistre le corps et les validateurs de la réponse 200 reçue pour `url`."""
+        data = body.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        now = time.time()
+        with self.lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            old = self.db.execute("SELECT digest FROM entries WHERE url = ?", (url,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (url, digest, size, etag, last_modified, fetched_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, len(data), headers.get("ETag"), headers.get("Last-Modified"), now, now)
+            )
+            if old and old[0] != digest:
+                self._drop_blob_if_unused(old[0])
+            self._evict()
+            self.db.commit()
+
+    def _drop_blob_if_unused(self, digest):
+        if not self.db.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+
+    def _total_bytes(self):
+        row = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM entries)").fetchone()
+        return row[0]
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées tant que la taille dépasse la limite."""
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        rows = self.db.execute("SELECT url, digest FROM entries ORDER BY accessed_at ASC").fetchall()
+        for url, digest in rows:
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            if not self.db.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+                size = os.path.getsize(self._blob_path(digest)) if os.path.exists(self._blob_path(digest)) else 0
+                self._drop_blob_if_unused(digest)
+                total -= size
+
+    def close(self):
+        with self.lock:
+            self.db.close()
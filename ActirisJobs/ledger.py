@@ -0,0 +1,84 @@
+# ledger.py
+
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.jsonl_log import open_log, read_jsonl
+
+# *********************
+# Registre persistant des offres déjà analysées (une ligne JSON par offre).
+# Chaque analyse est ajoutée puis fsync : un crash ne perd que l'offre en cours.
+# Une offre reportée par la pré-sélection (sans verdict) y est aussi notée, avec
+# son nombre de reports ; elle ne compte pas comme analysée.
+# *********************
+
+LEDGER_PATH = "analyzed_ledger.jsonl"
+
+
+def analyzed_urls(path=LEDGER_PATH):
+    """URLs présentes dans le registre, sans l'ouvrir en écriture."""
+    if not os.path.exists(path):
+        return set()
+    return {entry["url"] for entry in read_jsonl(path) if "decision" in entry}
+
+
+class Ledger:
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self.entries = {}
+        self.deferred = {}   # url -> nombre de reports, tant qu'aucun verdict n'est enregistré
+        if os.path.exists(path):
+            # dernière ligne tronquée par un crash : ignorée, puis terminée avant le prochain ajout
+            for entry in read_jsonl(path):
+                if "decision" in entry:
+                    self.entries[entry["url"]] = entry
+                    self.deferred.pop(entry["url"], None)
+                else:
+                    self.deferred[entry["url"]] = entry["deferred"]
+        self.file = open_log(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_done(self, url, model=None):
+        """Vrai si `url` a déjà été analysée (par `model` si précisé)."""
+        entry = self.entries.get(url)
+        if entry is None:
+            return False
+        return model is None or entry.get("model") == model
+
+    def deferrals(self, url):
+        """Nombre de fois où `url` a été reportée sans verdict."""
+        return self.deferred.get(url, 0)
+
+    def _append(self, entry):
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record(self, url, decision, justification, model):
+        entry = {
+            "url": url,
+            "decision": decision,
+            "justification": justification,
+            "model": model,
+            "analyzed_at": datetime.utcnow().isoformat() + "Z",
+        }
+        self._append(entry)
+        self.entries[url] = entry
+        self.deferred.pop(url, None)
+        return entry
+
+    def defer(self, url, reason):
+        """Note un report de `url` (pas de verdict) ; renvoie le nombre de reports."""
+        count = self.deferrals(url) + 1
+        self._append({"url": url, "deferred": count, "reason": reason,
+                      "deferred_at": datetime.utcnow().isoformat() + "Z"})
+        self.deferred[url] = count
+        return count
+
+    def close(self):
+        self.file.close()
@@ -5,58 +5,365 @@ from webdriver_manager.firefox import GeckoDriverManager
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+import argparse
 import csv
+import html
+import os
+import re
+import threading
 import time
+from urllib.parse import urljoin
+
+from fetcher import Fetcher
+from ledger import analyzed_urls
 
 # *********************
 # Full Scrap of actiris using Selenium
+# Utilisable seul (écrit actiris_detail_links.csv) ou depuis analyze.py --pipeline,
+# qui reçoit les liens page par page pendant que le scraping continue.
+# Crawl incrémental : les liens des crawls précédents sont mémorisés
+# (seen_links.txt) ; le parcours s'arrête à la première page sans nouvelle
+# offre (les résultats sont triés du plus récent au plus ancien) ou vide.
+# Une offre n'est "déjà vue" qu'une fois présente dans le registre d'analyse
+# (analyzed_ledger.jsonl) : un lien crawlé mais jamais analysé reste nouveau,
+# et reste dans actiris_detail_links.csv d'un crawl à l'autre.
+#
+# Modes de chargement des pages de résultats (CRAWL_MODE) :
+#   "http"    : simple requête HTTP, liens lus dans le HTML (pas de navigateur)
+#   "lean"    : Firefox sans images / polices / CSS, chargement "eager"
+#   "browser" : Firefox complet (comportement historique)
+#   "auto"    : "http" si la page 1 contient déjà les liens, sinon "lean"
+# `--benchmark` mesure le démarrage et le temps par page de chaque mode.
+# Au-delà de la page 1, les pages sont réparties entre CRAWL_DRIVERS
+# chargeurs parallèles, chacun redémarré toutes les RECYCLE_AFTER_PAGES pages.
 # *********************
 
-# Configuration Firefox 
-options = Options()
-options.headless = True
-options.set_preference(
-    "general.useragent.override",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
-)
+BASE_URL_PATH = "actiris_base_url.txt"
+LINKS_PATH = "actiris_detail_links.csv"
+SEEN_LINKS_PATH = "seen_links.txt"
+# Nombre maximal de pages à parcourir
+PAGES_TO_SCRAPE = 10
+INCREMENTAL = True   # False : parcourt toujours les PAGES_TO_SCRAPE pages
+CRAWL_MODE = "auto"
+LINK_SELECTOR = "a[href*='detail-offre-d-emploi']"
+PAGE_WAIT = 10       # secondes max pour voir apparaître les liens (navigateur)
+BROWSER_PAUSE = 1    # pause entre deux pages en mode navigateur (le mode http a son limiteur de débit)
+CRAWL_DRIVERS = 3    # limite de politesse : pages de résultats chargées en parallèle
+RECYCLE_AFTER_PAGES = 20   # navigateur redémarré après ce nombre de pages (mémoire bornée)
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+              "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36")
+
+# Préférences Firefox du mode "lean" : seules la structure HTML et le JS sont chargés
+LEAN_PREFS = {
+    "permissions.default.image": 2,
+    "permissions.default.stylesheet": 2,
+    "browser.display.use_document_fonts": 0,
+    "gfx.downloadable_fonts.enabled": False,
+    "media.autoplay.default": 5,
+    "media.autoplay.blocking_policy": 2,
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "network.http.speculative-parallel-limit": 0,
+}
+
+_LINK_RE = re.compile(r'href\s*=\s*["\']([^"\']*detail-offre-d-emploi[^"\']*)["\']', re.IGNORECASE)
+
+
+def make_driver(lean=False):
+    # Configuration Firefox
+    options = Options()
+    options.add_argument("-headless")
+    options.set_preference("general.useragent.override", USER_AGENT)
+    if lean:
+        for name, value in LEAN_PREFS.items():
+            options.set_preference(name, value)
+        # rend la main dès que le DOM est prêt, sans attendre les ressources
+        options.page_load_strategy = "eager"
+        # geckodriver résolu et mis en cache par Selenium Manager (pas de requête GitHub à chaque lancement)
+        return webdriver.Firefox(service=Service(), options=options)
+    return webdriver.Firefox(service=Service(GeckoDriverManager().install()), options=options)
+
+
+def extract_links(page_html, page_url):
+    """Liens d'offres présents dans le HTML brut d'une page de résultats."""
+    return {urljoin(page_url, html.unescape(href)) for href in _LINK_RE.findall(page_html)}
+
+
+class BrowserLoader:
+    """Pages de résultats chargées dans Firefox (complet ou "lean")."""
+
+    def __init__(self, lean=False):
+        self.mode = "lean" if lean else "browser"
+        self.pause = BROWSER_PAUSE
+        start = time.perf_counter()
+        self.driver = make_driver(lean)
+        self.startup = time.perf_counter() - start
 
-driver = webdriver.Firefox(service=Service(GeckoDriverManager().install()), options=options)
+    def links(self, url):
+        """Liens d'offres de la page ; ensemble vide si aucun lien n'apparaît."""
+        self.driver.get(url)
+        try:
+            elements = WebDriverWait(self.driver, PAGE_WAIT).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, LINK_SELECTOR))
+            )
+        except TimeoutException:
+            return set()
+        return {a.get_attribute("href") for a in elements}
 
-# Lien de base (tu peux personnaliser tes filtres ici)
-base_url = ""
-with open("actiris_base_url.txt", "r", encoding="utf-8") as f:
-    base_url = f.read().strip()
+    def close(self):
+        self.driver.quit()
 
-# Nombre de pages à parcourir
-pages_to_scrape = 10
 
-all_links = set()
+class HttpLoader:
+    """Pages de résultats téléchargées en HTTP, sans navigateur."""
 
-for page in range(1, pages_to_scrape + 1):
-    url = base_url.format(page)
-    print(f"🔄 Chargement page {page} : {url}")
-    driver.get(url)
+    mode = "http"
+    pause = 0
 
+    def __init__(self):
+        start = time.perf_counter()
+        self.fetcher = Fetcher(workers=1)
+        self.fetcher.session.headers["User-Agent"] = USER_AGENT
+        self.startup = time.perf_counter() - start
+        self.prefetched = {}
+
+    def links(self, url):
+        if url in self.prefetched:
+            return self.prefetched.pop(url)
+        return extract_links(self.fetcher.fetch(url), url)
+
+    def close(self):
+        self.fetcher.close()
+
+
+def open_loader(mode, first_url):
+    """Ouvre le chargeur du mode demandé ; en "auto", teste d'abord la page 1 en HTTP."""
+    if mode == "http":
+        return HttpLoader()
+    if mode in ("lean", "browser"):
+        return BrowserLoader(lean=mode == "lean")
+    if mode != "auto":
+        raise ValueError(f"mode de crawl inconnu : {mode!r}")
+    loader = HttpLoader()
     try:
-        links = WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a[href*='detail-offre-d-emploi']"))
-        )
-        page_links = {a.get_attribute("href") for a in links}
-        print(f"  → {len(page_links)} liens trouvés.")
-        all_links.update(page_links)
+        links = loader.links(first_url)
+        if links:
+            print("⚡ Liens présents dans le HTML : crawl en HTTP, sans navigateur.")
+            loader.prefetched[first_url] = links
+            return loader
     except Exception as e:
-        print(f"  ⚠️ Erreur page {page} : {e}")
-    
-    time.sleep(1)
+        print(f"  ⚠️ HTTP indisponible ({e})")
+    loader.close()
+    print("🦊 Liens générés en JavaScript : crawl avec Firefox allégé.")
+    return BrowserLoader(lean=True)
+
+
+def load_base_url(path=BASE_URL_PATH):
+    # Lien de base (tu peux personnaliser tes filtres ici)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def load_seen_links(path=SEEN_LINKS_PATH):
+    """Liens vus lors des crawls précédents."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def load_saved_links(path=LINKS_PATH):
+    """Liens du CSV écrit par le crawl précédent."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["detail_url"] for row in csv.DictReader(f) if row.get("detail_url")}
+
+
+def remember_links(links, path=SEEN_LINKS_PATH):
+    with open(path, "a", encoding="utf-8") as f:
+        for url in sorted(links):
+            f.write(url + "\n")
+
+
+def scrape(on_links=None, pages_to_scrape=PAGES_TO_SCRAPE, links_path=LINKS_PATH, incremental=INCREMENTAL,
+           mode=CRAWL_MODE, drivers=CRAWL_DRIVERS):
+    """
+    Parcourt les pages de résultats et renvoie l'ensemble des liens d'offres.
+    `on_links(liens)` reçoit les nouveaux liens de chaque page dès son chargement ;
+    `links_path` (optionnel) reçoit la liste complète en CSV à la fin, y compris les
+    liens du CSV précédent qui n'ont pas encore été analysés (aussi passés à `on_links`).
+    En mode incrémental, s'arrête à la première page qui n'apporte aucun lien inconnu
+    (un lien vu mais absent du registre d'analyse compte comme inconnu).
+    La page 1 est chargée seule ; s'il faut continuer, les pages suivantes sont
+    réparties entre `drivers` chargeurs (navigateurs) qui travaillent en parallèle.
+    """
+    base_url = load_base_url()
+    seen = load_seen_links()
+    # vus ET analysés : un lien crawlé dont l'analyse n'a pas eu lieu sera repris
+    analyzed = analyzed_urls()
+    known = seen & analyzed
+    # liens non analysés du crawl précédent : repris même si le parcours s'arrête avant leur page
+    carried = load_saved_links(links_path or LINKS_PATH) - analyzed
+    all_links = set()
+    lock = threading.Lock()
+    state = {"next": 1, "stop": pages_to_scrape, "loaded": 0, "page_time": 0.0, "startup": 0.0, "started": 0}
+
+    def start_loader(requested):
+        loader = open_loader(requested, base_url.format(1))
+        loader.served = 0
+        with lock:
+            state["startup"] += loader.startup
+            state["started"] += 1
+        return loader
+
+    def take_page():
+        with lock:
+            page = state["next"]
+            if page > state["stop"]:
+                return None
+            state["next"] += 1
+            state["loaded"] += 1
+            return page
+
+    def stop_after(page):
+        with lock:
+            state["stop"] = min(state["stop"], page)
+
+    def load(loader, page):
+        url = base_url.format(page)
+        print(f"🔄 Chargement page {page} : {url}")
+        start = time.perf_counter()
+        try:
+            page_links = loader.links(url)
+        except Exception as e:
+            print(f"  ⚠️ Erreur page {page} : {e}")
+            return
+        finally:
+            loader.served += 1
+            with lock:
+                state["page_time"] += time.perf_counter() - start
+        if not page_links:
+            print(f"  ⏹️ Page {page} vide : fin des résultats.")
+            stop_after(page)
+            return
+
+        with lock:
+            new_links = page_links - all_links
+            unseen = new_links - known
+            all_links.update(page_links)
+        print(f"  → page {page} : {len(page_links)} liens trouvés, {len(unseen)} nouveaux ou pas encore analysés.")
+        if on_links and new_links:
+            on_links(sorted(new_links))
+        if incremental and not unseen:
+            print(f"  ⏹️ Aucune nouvelle offre page {page} : les suivantes ont déjà été vues.")
+            stop_after(page)
+            return
+        time.sleep(loader.pause)
+
+    def worker(loader):
+        try:
+            while True:
+                page = take_page()
+                if page is None:
+                    return
+                if loader is None or loader.served >= RECYCLE_AFTER_PAGES:
+                    # navigateur recyclé régulièrement pour borner sa mémoire
+                    if loader is not None:
+                        loader.close()
+                    loader = start_loader(resolved)
+                load(loader, page)
+        except Exception as e:
+            print(f"  ⚠️ Chargeur arrêté : {e}")
+        finally:
+            if loader is not None:
+                loader.close()
+
+    first = start_loader(mode)
+    resolved = first.mode
+    page = take_page()
+    if page is not None:
+        load(first, page)
+    # pages suivantes : un chargeur par thread, au plus `drivers` en parallèle
+    threads = [threading.Thread(target=worker, args=(first if i == 0 else None,), name=f"crawl-{i}")
+               for i in range(max(1, drivers))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    carried -= all_links
+    if carried:
+        print(f"📌 {len(carried)} liens du crawl précédent pas encore analysés, repris.")
+        if on_links:
+            on_links(sorted(carried))
+        all_links |= carried
+    if links_path:
+        save_links(all_links, links_path)
+    remember_links(all_links - seen)
+    loaded = state["loaded"]
+    skipped = pages_to_scrape - loaded
+    print(f"\n✅ Total : {len(all_links)} liens uniques extraits sur {loaded} pages"
+          + (f" ({skipped} pages non chargées)." if skipped else "."))
+    print(f"⏱️ Mode {resolved} : démarrage {state['startup'] / max(1, state['started']):.1f}s "
+          f"({state['started']} chargeurs), {state['page_time'] / max(1, loaded):.2f}s/page ({loaded} pages)")
+    return all_links
+
+
+def benchmark(pages=3, modes=("http", "lean", "browser")):
+    """Compare le démarrage et le temps par page de chaque mode (aucun fichier écrit)."""
+    base_url = load_base_url()
+    results = []
+    for mode in modes:
+        print(f"\n🏁 Mode {mode}")
+        try:
+            loader = open_loader(mode, base_url.format(1))
+        except Exception as e:
+            print(f"  ⚠️ Démarrage impossible : {e}")
+            continue
+        found = 0
+        start = time.perf_counter()
+        try:
+            for page in range(1, pages + 1):
+                found += len(loader.links(base_url.format(page)))
+        except Exception as e:
+            print(f"  ⚠️ Erreur : {e}")
+        finally:
+            per_page = (time.perf_counter() - start) / pages
+            loader.close()
+        results.append((mode, loader.startup, per_page, found))
+
+    print("\nmode      démarrage   s/page   liens")
+    for mode, startup, per_page, found in results:
+        print(f"{mode:<9} {startup:>8.1f}s {per_page:>7.2f}s {found:>7}")
+    return results
+
+
+def save_links(links, path=LINKS_PATH):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["detail_url"])
+        for url in sorted(links):
+            writer.writerow([url])
+
 
-driver.quit()
+def main():
+    parser = argparse.ArgumentParser(description="Scraping des liens d'offres Actiris.")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore les crawls précédents et parcourt toutes les pages")
+    parser.add_argument("--mode", choices=["auto", "http", "lean", "browser"], default=CRAWL_MODE,
+                        help="chargement des pages de résultats")
+    parser.add_argument("--drivers", type=int, default=CRAWL_DRIVERS,
+                        help="navigateurs en parallèle (limite de politesse)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="mesure le temps de chaque mode sur les premières pages")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark()
+    else:
+        scrape(incremental=not args.full, mode=args.mode, drivers=args.drivers)
 
-# Sauvegarde
-with open("actiris_detail_links.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["detail_url"])
-    for url in sorted(all_links):
-        writer.writerow([url])
 
-print(f"\n✅ Total : {len(all_links)} liens uniques extraits sur {pages_to_scrape} pages.")
+if __name__ == "__main__":
+    main()
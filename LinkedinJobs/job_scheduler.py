@@ -0,0 +1,151 @@
+# job_scheduler.py
+
+import asyncio
+import heapq
+import itertools
+import threading
+
+# *********************
+# File de priorité des offres capturées, à la place d'une FIFO :
+#  - l'offre de la recherche courante passe avant celles des recherches
+#    précédentes (gardées, mais analysées ensuite) ;
+#  - à recherche égale, la dernière capturée passe en premier ;
+#  - une offre déjà en attente n'est pas dupliquée : un nouveau clic la remet
+#    en tête ; une offre en cours d'analyse est ignorée ;
+#  - une offre en attente peut être annulée (cancel), et au-delà de
+#    max_pending les offres les moins prioritaires sont abandonnées (comptées
+#    dans `dropped` ; put renvoie DROPPED si c'est l'offre qu'il vient d'ajouter).
+# Suppression paresseuse : les entrées périmées du tas sont sautées au retrait.
+# *********************
+
+MAX_PENDING = 200
+
+QUEUED, BUMPED, RUNNING, DROPPED = "queued", "bumped", "running", "dropped"
+
+
+class JobScheduler:
+    def __init__(self, max_pending=MAX_PENDING):
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.heap = []          # (rang de recherche, -séquence, jid)
+        self.pending = {}       # jid -> (offre, séquence)
+        self.running = set()    # jid en cours d'analyse
+        self.seq = itertools.count()
+        self.current_fp = None
+        self.closed = False
+        self.event = None       # asyncio.Event du moteur asyncio (voir aget)
+        self.cancelled = 0      # retirées à la demande (cancel)
+        self.dropped = 0        # abandonnées faute de place (max_pending)
+
+    def _rank(self, job):
+        return 0 if job.get("origin_fp") == self.current_fp else 1
+
+    def _push(self, jid, job):
+        seq = next(self.seq)
+        self.pending[jid] = (job, seq)
+        heapq.heappush(self.heap, (self._rank(job), -seq, jid))
+
+    def _wake(self):
+        self.ready.notify()
+        if self.event is not None:
+            self.event.set()
+
+    def put(self, job):
+        """
+        Met l'offre en file ; renvoie QUEUED, BUMPED (déjà en attente, remise en tête),
+        RUNNING (déjà en cours) ou DROPPED (file pleine, l'offre est la moins prioritaire).
+        """
+        jid = job["job_id"]
+        with self.lock:
+            if jid in self.running:
+                return RUNNING
+            status = BUMPED if jid in self.pending else QUEUED
+            self._push(jid, job)
+            if jid in self._trim():
+                return DROPPED
+            self._wake()
+        return status
+
+    def _trim(self):
+        """Abandonne les entrées les moins prioritaires au-delà de max_pending ; renvoie leurs jid."""
+        dropped = []
+        while len(self.pending) > self.max_pending:
+            # l'entrée la moins prioritaire : autre recherche, capturée le plus tôt
+            jid = max(self.pending, key=lambda j: (self._rank(self.pending[j][0]), -self.pending[j][1]))
+            del self.pending[jid]
+            self.dropped += 1
+            dropped.append(jid)
+        return dropped
+
+    def cancel(self, jid):
+        """Retire une offre en attente ; renvoie False si elle n'y est pas (ou déjà en cours)."""
+        with self.lock:
+            if self.pending.pop(jid, None) is None:
+                return False
+            self.cancelled += 1
+            return True
+
+    def set_search(self, fp):
+        """La recherche courante change : les priorités sont recalculées."""
+        with self.lock:
+            if fp == self.current_fp:
+                return
+            self.current_fp = fp
+            self.heap = [(self._rank(job), -seq, jid) for jid, (job, seq) in self.pending.items()]
+            heapq.heapify(self.heap)
+
+    def _pop(self):
+        while self.heap:
+            _, neg_seq, jid = heapq.heappop(self.heap)
+            entry = self.pending.get(jid)
+            if entry is None or entry[1] != -neg_seq:
+                continue   # annulée ou remise en tête depuis
+            del self.pending[jid]
+            self.running.add(jid)
+            return entry[0]
+        return None
+
+    def get(self):
+        """Offre la plus prioritaire (bloquant), ou None une fois la file fermée."""
+        with self.ready:
+            while True:
+                job = self._pop()
+                if job is not None:
+                    return job
+                if self.closed:
+                    return None
+                self.ready.wait()
+
+    async def aget(self):
+        """Équivalent asyncio de `get`, à n'utiliser que depuis la boucle d'évènements."""
+        if self.event is None:
+            self.event = asyncio.Event()
+        while True:
+            with self.lock:
+                job = self._pop()
+                if job is not None or self.closed:
+                    return job
+                self.event.clear()
+            await self.event.wait()
+
+    def done(self, jid):
+        """L'analyse de `jid` est terminée (ou abandonnée) : un nouveau clic pourra la remettre en file."""
+        with self.lock:
+            self.running.discard(jid)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.ready.notify_all()
+            if self.event is not None:
+                self.event.set()
+
+    def busy(self):
+        """Offres en attente ou en cours d'analyse."""
+        with self.lock:
+            return len(self.pending) + len(self.running)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending)
@@ -0,0 +1,213 @@
+# job_store.py
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.jsonl_log import open_log, read_jsonl
+
+# *********************
+# Stockage des offres retenues : journal JSONL en ajout seul (une ligne par
+# offre, fsync) et index des identifiants en mémoire -> insertion en O(1) ;
+# un crash ne peut tronquer que la dernière ligne, ignorée au chargement.
+# jobs_db.json (format historique, lu par le dashboard) est régénéré de façon
+# atomique (fichier temporaire + os.replace) au plus toutes les
+# EXPORT_INTERVAL secondes, et à la fermeture. Une offre mise à jour (update)
+# est réécrite en fin de journal ; au-delà de COMPACT_STALE_LINES versions
+# périmées, l'export réécrit le journal avec la dernière version de chaque offre.
+# VerdictIndex garde de la même façon l'identifiant et le verdict de TOUTES les
+# offres analysées (retenues ou non) : une offre déjà jugée n'est plus renvoyée
+# au LLM, même après un redémarrage.
+# *********************
+
+LOG_PATH = "jobs_db.jsonl"
+EXPORT_PATH = "jobs_db.json"
+EXPORT_INTERVAL = 5.0
+COMPACT_STALE_LINES = 200
+VERDICTS_PATH = "analyzed_ids.jsonl"
+
+
+def atomic_write_json(path, data, indent=2):
+    """Écrit `data` dans un fichier temporaire puis le renomme : le fichier n'est jamais à moitié écrit."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def job_key(job):
+    """
+    Identifiant canonique d'une offre, le même pour le moniteur, le stockage et le dashboard :
+     - l'id numérique LinkedIn (job_id, sinon extrait du lien : currentJobId, jobId, /jobs/view/...)
+     - sinon un job_id non numérique déjà attribué
+     - sinon hash(title|company|location|link)
+    """
+    jid = str(job.get("job_id") or "").strip()
+    if jid.isdigit():
+        return jid
+
+    link = job.get("link") or ""
+    m = re.search(r'(?:currentJobId=|jobId=|/jobs/view/|/jobs/)(\d+)', link)
+    if m:
+        return m.group(1)
+    if jid:
+        return jid
+
+    # fallback deterministic hash
+    key = "|".join([
+        (job.get("title") or "").strip()[:200],
+        (job.get("company") or "").strip()[:120],
+        (job.get("location") or "").strip()[:80],
+        link[:300]
+    ])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class JobStore:
+    def __init__(self, path=LOG_PATH, export_path=EXPORT_PATH, export_interval=EXPORT_INTERVAL):
+        self.path = path
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.jobs = {}
+        self.lines = 0          # lignes du journal, versions périmées comprises
+        self.lock = threading.Lock()
+        self.export_lock = threading.Lock()
+        self.timer = None
+
+        if os.path.exists(path):
+            # une offre mise à jour (update) est réécrite plus loin : la dernière ligne l'emporte
+            for job in read_jsonl(path):
+                self.jobs[job_key(job)] = job
+                self.lines += 1
+            self.file = open_log(path)
+        else:
+            self.file = open(path, "a", encoding="utf-8")
+            self._migrate()
+
+    def _migrate(self):
+        """Première utilisation : reprend les offres de l'ancien jobs_db.json."""
+        if not os.path.exists(self.export_path):
+            return
+        try:
+            with open(self.export_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        for jid, job in data.items():
+            self.jobs[jid] = job
+            self.file.write(json.dumps(job, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.lines = len(self.jobs)
+        print(f"[DB] {len(self.jobs)} offres reprises depuis {self.export_path}")
+
+    def __contains__(self, jid):
+        return jid in self.jobs
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def _append(self, jid, job):
+        self.file.write(json.dumps(job, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.jobs[jid] = job
+        self.lines += 1
+        if self.timer is None:
+            self.timer = threading.Timer(self.export_interval, self.export)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def add_if_new(self, job):
+        """Ajoute `job` s'il est inconnu ; renvoie (ajouté, identifiant)."""
+        jid = job_key(job)
+        with self.lock:
+            if jid in self.jobs:
+                return False, jid
+            self._append(jid, job)
+        return True, jid
+
+    def update(self, job):
+        """Remplace une offre déjà enregistrée (ex. justification différée) ; renvoie son identifiant."""
+        jid = job_key(job)
+        with self.lock:
+            self._append(jid, job)
+        return jid
+
+    def _compact(self):
+        """Réécrit le journal avec la dernière version de chaque offre (fichier temporaire + os.replace)."""
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for job in self.jobs.values():
+                f.write(json.dumps(job, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(tmp, self.path)
+        self.file = open_log(self.path)
+        print(f"[DB] journal compacté : {self.lines - len(self.jobs)} versions périmées supprimées")
+        self.lines = len(self.jobs)
+
+    def export(self):
+        """Régénère jobs_db.json ({id: offre}) pour le dashboard ; compacte le journal si besoin."""
+        with self.lock:
+            self.timer = None
+            snapshot = dict(self.jobs)
+            if self.lines - len(self.jobs) > COMPACT_STALE_LINES:
+                self._compact()
+        with self.export_lock:
+            atomic_write_json(self.export_path, snapshot)
+
+    def close(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+        self.export()
+        self.file.close()
+
+
+class VerdictIndex:
+    """Identifiant -> verdict ("OUI" / "NON") de chaque offre analysée, persisté en JSONL."""
+
+    def __init__(self, path=VERDICTS_PATH):
+        self.path = path
+        self.verdicts = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            for entry in read_jsonl(path):
+                self.verdicts[entry["job_id"]] = entry.get("decision")
+        self.file = open_log(path)
+
+    def seed(self, jids, decision="OUI"):
+        """Reprend des offres jugées avant l'existence de l'index (ex. les offres retenues)."""
+        for jid in jids:
+            if jid not in self.verdicts:
+                self.record(jid, decision)
+
+    def __contains__(self, jid):
+        return jid in self.verdicts
+
+    def __len__(self):
+        return len(self.verdicts)
+
+    def get(self, jid):
+        return self.verdicts.get(jid)
+
+    def record(self, jid, decision):
+        entry = {"job_id": jid, "decision": decision, "analyzed_at": datetime.utcnow().isoformat() + "Z"}
+        with self.lock:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.verdicts[jid] = decision
+
+    def close(self):
+        with self.lock:
+            self.file.close()
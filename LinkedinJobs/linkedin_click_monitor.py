@@ -1,12 +1,14 @@
 #!/usr/bin/env python3
+import argparse
+import asyncio
 import time
 import json
 import re
 import threading
-import queue
 import os
 from datetime import datetime
 import hashlib
+import sys
 from urllib.parse import urlparse, parse_qs
 
 from selenium import webdriver
@@ -16,20 +18,58 @@ from selenium.webdriver.firefox.firefox_profile import FirefoxProfile
 
 # LM Studio / OpenAI local client
 # Best gpt-oss-20b or on small config google/gemma-3n-e4b
-from openai import OpenAI
-client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
+from openai import AsyncOpenAI, OpenAI
+LLM_BASE_URL = "http://localhost:1234/v1"
+client = OpenAI(base_url=LLM_BASE_URL, api_key="lm-studio")
 MODEL_NAME = "google/gemma-3n-e4b"
+TEMPERATURE = 0.05
+TOP_P = 0.8
+STREAM_DECISION = True   # streaming : un NON coupe la génération dès la première ligne
+OUI_MODE = "continue"    # "defer" : pas de justification pour les OUI (générée plus tard : --justify)
+# Pré-sélection par embeddings : offre rejetée sans LLM si trop éloignée du profil et des offres retenues
+EMBED_SCREEN = False
+EMBED_MIN_SCORE = 0.55
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from job_scheduler import BUMPED, DROPPED, RUNNING, JobScheduler
+from job_store import JobStore, VerdictIndex, job_key
+from stats_store import FLUSH_INTERVAL as STATS_FLUSH_INTERVAL, Stats
+from common.llm_cache import LLMCache, acached_call, cached_call, decision_of, make_key
+from common.llm_dispatcher import AdaptiveDispatcher
+from common.llm_stream import aread_until_decision, aresponses_deltas, read_until_decision, responses_deltas
+from common.embeddings import RelevanceScreen, offer_text
+from common.near_duplicates import NearDuplicateIndex, fingerprint
+from common.prefilter import PreFilter
+from common.prompt_builder import PROMPT_TOKEN_BUDGET, compact_fields, token_report
+from common.prompt_layout import PROMPT_LAYOUT, chat_messages, stable_context
+llm_cache = LLMCache()
 
 current_fp_global = None
+current_search_key = None  # dernière clé de recherche renvoyée par la page (canal push)
+autopilot_state = {"enabled": False, "finished": False, "reported": False, "started_at": None,
+                   "analyzed_at_start": 0, "dropped_at_start": 0, "restarts": 0, "last_captured": None, "status": None, "rates": None}
 
 # ----------------- CONFIG -----------------
 # Linkedin Search Link
 LINKEDIN_SEARCH_URL = ""
 with open("linkedin_search_url.txt", "r", encoding="utf-8") as f:
     LINKEDIN_SEARCH_URL = f.read().strip()
-DB_PATH = "jobs_db.json"
-ANALYSIS_WORKERS = 2
+DB_PATH = "jobs_db.json"        # export au format historique (lu par le dashboard)
+DB_LOG_PATH = "jobs_db.jsonl"   # journal des offres retenues (source de vérité)
+VERDICTS_PATH = "analyzed_ids.jsonl"  # identifiant + verdict de toutes les offres analysées
+ANALYSIS_WORKERS = 8  # plafond ; la concurrence réelle est ajustée par le dispatcher
+ENGINE = "threads"    # "asyncio" : un seul thread d'évènements, AsyncOpenAI (voir --engine)
+ASYNC_CONCURRENCY = 32  # plafond du moteur asyncio (endpoint distant ou batché), ajusté par un dispatcher
 POLL_INTERVAL = 0.8  # secondes
+CAPTURE_MODE = "push"  # "push" : la page réveille Python (long-poll) ; "poll" : sondage toutes les POLL_INTERVAL s
+WAIT_TIMEOUT = 5.0     # secondes max d'une attente côté page (borne aussi le délai d'arrêt)
+# Pilote automatique (--autopilot) : la page parcourt seule la liste de résultats
+AUTOPILOT = False
+AUTOPILOT_DELAY = 4.0      # secondes entre deux offres (± 25 %)
+AUTOPILOT_SETTLE = 8.0     # secondes max d'attente du panneau de détail après un clic
+AUTOPILOT_MAX_BACKLOG = 20 # offres en attente d'analyse au-delà desquelles le parcours se met en pause
+AUTOPILOT_MAX_PAGES = 10   # pages de résultats parcourues au plus
+AUTOPILOT_RESTARTS = 3     # relances après un rechargement complet de la page
 FIREFOX_PROFILE_PATH = "E:\ROAMING\Mozilla\Firefox\Profiles\ojqxo9xy.dev-edition-default" 
 
 # ****************************************************
@@ -40,41 +80,34 @@ FIREFOX_PROFILE_PATH = "E:\ROAMING\Mozilla\Firefox\Profiles\ojqxo9xy.dev-edition
 USER_CONTEXT = ""
 with open("user_context.txt", "r", encoding="utf-8") as f:
   USER_CONTEXT = f.read()
+# préfixe commun à tous les appels (PROMPT_LAYOUT = "system") : réutilisé par le cache KV de LM Studio
+SYSTEM_CONTEXT = stable_context(USER_CONTEXT)
 
 # ---------- STATS ----------
 STATS_PATH = "stats.json"
-stats_lock = threading.Lock()
-stats = {
-    "total_analyzed": 0,
-    "retained": 0,
-    "last_updated": None
-}
-
-def load_stats():
-    global stats
-    try:
-        if os.path.exists(STATS_PATH):
-            with open(STATS_PATH, "r", encoding="utf-8") as f:
-                stats = json.load(f)
-    except Exception:
-        pass
-
-def save_stats():
-    global stats
-    try:
-        stats["last_updated"] = datetime.utcnow().isoformat() + "Z"
-        with open(STATS_PATH, "w", encoding="utf-8") as f:
-            json.dump(stats, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print("[stats] save error:", e)
-
-# charger au démarrage
-load_stats()
+# compteurs en mémoire, stats.json réécrit périodiquement (et à l'arrêt)
+stats = Stats(STATS_PATH)
 
 # ------------------------------------------
 
-processing_queue = queue.Queue()
-db_lock = threading.Lock()
+# seuls ces champs vont dans le prompt : les champs internes (ts, origin_fp,
+# company_method, link...) n'aident pas le modèle et empêcheraient un re-clic
+# sur la même offre de profiter du cache LLM
+PROMPT_FIELDS = {"title": "title", "company": "company", "location": "location", "description": "description"}
+
+# file de priorité : dernier clic d'abord, recherches précédentes ensuite, sans doublons
+processing_queue = JobScheduler()
+# offres retenues : ajout en O(1), jobs_db.json régénéré en arrière-plan
+job_store = JobStore(DB_LOG_PATH, export_path=DB_PATH)
+# offres déjà jugées (OUI ou NON) : vérifiées en O(1) avant la mise en file
+verdicts = VerdictIndex(VERDICTS_PATH)
+verdicts.seed(job_store.jobs)
+dispatcher = AdaptiveDispatcher(max_limit=ANALYSIS_WORKERS, name="linkedin-llm")
+# rejet d'office dans screen_job, compté dans stats["prefiltered"]
+prefilter = PreFilter.from_file()
+screen = RelevanceScreen(client, context_text=USER_CONTEXT, namespace="linkedin") if EMBED_SCREEN else None
+# republications LinkedIn et offres déjà vues sur Actiris (voir duplicate_output)
+near_duplicates = NearDuplicateIndex()
 
 # ---------------- JS WATCHER (V3) ----------------
 # Ce JS retourne "injectedV3" si l'injection a pu être faite.
@@ -107,12 +140,49 @@ return (function(){
   window.__jobWatcherInjectedV3 = true;
   window.__jobQueue = window.__jobQueue || [];
   window.__jobWatcherLogs = window.__jobWatcherLogs || [];
+  window.__jobWaiters = window.__jobWaiters || [];
+  window.__jobCancels = window.__jobCancels || [];   // ids à retirer de la file Python (SHIFT+X)
+
+  // clé de recherche (mêmes paramètres que page_fingerprint côté Python), suivie
+  // depuis les évènements d'historique : plus besoin de lire current_url en boucle
+  function searchKey(){
+    try{
+      const u = new URL(window.location.href);
+      const q = u.searchParams;
+      return [u.pathname, q.get('keywords')||'', q.get('geoId')||'', q.get('f_TPR')||'', q.get('f_WT')||''].join('|');
+    }catch(e){ return ''; }
+  }
+  window.__jobSearchKey = searchKey();
+
+  // réveille les attentes de JS_WAIT_JOBS (canal push)
+  function notify(){
+    const waiters = window.__jobWaiters.splice(0);
+    for(const w of waiters){ try{ w(); }catch(e){} }
+  }
+  function onNavigate(){
+    const k = searchKey();
+    if(k !== window.__jobSearchKey){ window.__jobSearchKey = k; notify(); }
+  }
 
   // Priorité de selecteurs : on teste les plus spécifiques AVANT le h1 général
   const TITLE_SELECTORS = ['[data-test-job-title]', '.jobs-unified-top-card__job-title', '.topcard__title', 'h1'];
   const COMPANY_SELECTORS = ['[data-test-company-name]', '.jobs-unified-top-card__company-name a', '.topcard__org-name-link', 'a[href*="/company/"]', 'a[href*="/cmp/"]'];
   const LOCATION_SELECTORS = ['[data-test-job-location]', '.jobs-unified-top-card__workplace-location', '.jobs-unified-top-card__bullet', '.jobs-unified-top-card__subtitle', '.jobs-search-box__container'];
   const DESC_SELECTORS = ['.jobs-description__container', '.show-more-less-html__markup', '.jobs-description-content__text', '.description__text'];
+  const PANE_SELECTORS = ['.jobs-search__job-details--container', '.jobs-details__main-content', '.jobs-unified-top-card', '.jobs-details__content', '.jobs-search__right-rail'];
+  const TOP_CARD_SELECTORS = '.jobs-unified-top-card, .job-details-jobs-unified-top-card__container--two-pane, .top-card-layout';
+  const MIN_GAP = 250;        // ms minimum entre deux extractions
+  const DESC_MAX_CHARS = 6000;  // taille max du texte de description envoyé à Python
+  const MAX_SECTIONS = 20;
+  const BLOCK_TAGS = /^(P|DIV|LI|UL|OL|BR|H[1-6]|SECTION|ARTICLE|TR|TABLE)$/;
+  const SKIP_TAGS = /^(SCRIPT|STYLE|NOSCRIPT|SVG|BUTTON|IMG|FORM|TEMPLATE)$/;
+  const SAFETY_TICK = 5000;   // ms, filet de sécurité si aucune mutation n'est observée
+  const DESC_WAIT = 1500;     // ms d'attente max de la description d'une nouvelle offre
+  const PANE_GAP = 2000;      // ms entre deux envois du panneau entier (aucun sélecteur de description)
+
+  // compteurs de coût du watcher dans l'onglet, renvoyés à Python par JS_WAIT_JOBS
+  const st = window.__jobWatcherStats = {mutations: 0, triggers: 0, extractions: 0, skipped: 0, pushes: 0,
+                                         waiting: 0, extract_ms: 0, extract_ms_max: 0, rescoped: 0, last_job_id: null};
 
   function firstTextWithin(root, selectors){
     for(const s of selectors){
@@ -120,11 +190,52 @@ return (function(){
     }
     return "";
   }
-  function firstHtmlWithin(root, selectors){
+  function firstElementWithin(root, selectors){
     for(const s of selectors){
-      try{ const el = root.querySelector(s); if(el && (el.innerHTML || el.innerText)) return el.innerHTML || el.innerText || ""; } catch(e){}
+      try{ const el = root.querySelector(s); if(el && el.textContent && el.textContent.trim()) return el; } catch(e){}
     }
-    return "";
+    return null;
+  }
+
+  // Texte compact d'une description : un paragraphe par ligne, puces "- ", espaces
+  // normalisés, au plus DESC_MAX_CHARS caractères (le parcours s'arrête au plafond).
+  // `sections` relève les intertitres (h1-h6, <strong> seul dans son bloc) et leur position.
+  function compactText(el){
+    const lines = [], sections = [];
+    let line = "", size = 0, full = false;
+    function flush(){
+      const t = line.replace(/\s+/g, " ").trim();
+      line = "";
+      if(!t || full) return;
+      if(size + t.length > DESC_MAX_CHARS){
+        full = true;
+        const rest = DESC_MAX_CHARS - size;
+        if(rest > 0) lines.push(t.slice(0, rest));
+        return;
+      }
+      lines.push(t);
+      size += t.length + 1;
+    }
+    function walk(node){
+      if(full) return;
+      if(node.nodeType === 3){ line += node.nodeValue; return; }
+      if(node.nodeType !== 1 || SKIP_TAGS.test(node.tagName)) return;
+      const tag = node.tagName;
+      const heading = /^H[1-6]$/.test(tag) ||
+        (/^(STRONG|B)$/.test(tag) && !!node.parentElement && node.parentElement.textContent.trim() === node.textContent.trim());
+      const block = heading || BLOCK_TAGS.test(tag);
+      if(block) flush();
+      if(heading && sections.length < MAX_SECTIONS){
+        const h = node.textContent.replace(/\s+/g, " ").trim();
+        if(h && h.length < 120) sections.push({heading: h, offset: size});
+      }
+      if(tag === "LI") line += "- ";
+      for(const child of node.childNodes) walk(child);
+      if(block) flush();
+    }
+    walk(el);
+    flush();
+    return {text: lines.join("\n"), sections: sections, truncated: full};
   }
 
   function findCompany(root, titleEl){
@@ -188,11 +299,13 @@ return (function(){
     return null;
   }
 
+  function findPane(){
+    for (const s of PANE_SELECTORS) { try { const el = document.querySelector(s); if(el) return el; } catch(e){} }
+    return null;
+  }
+
   function getRightPaneDetail(){
-    const paneCandidates = ['.jobs-search__job-details--container', '.jobs-details__main-content', '.jobs-unified-top-card', '.jobs-details__content', '.jobs-search__right-rail'];
-    let root = null;
-    for (var s of paneCandidates) { try { let el = document.querySelector(s); if(el){ root = el; break; } } catch(e){} }
-    if(!root) root = document;
+    let root = findPane() || document;
 
     // Try title using prioritized selectors (specific first)
     let titleEl = null;
@@ -227,10 +340,12 @@ return (function(){
     // Another fallback: if location still empty, try to find it near header or in document
     if(!location){
       try {
-        // look for any small element with 'Région' / 'Region' / country words in pane
-        const textCandidates = Array.from(root.querySelectorAll('span, div, p, li')).map(n=> (n.innerText||'').trim()).filter(Boolean);
-        for(const t of textCandidates){
-          if(/Région|Region|Belgique|Belgium|Bruxelles|Brussels|Bruxelles-Capitale|Capital/i.test(t) && t.length < 120){
+        // look for any small element with 'Région' / 'Region' / country words in the top card only
+        const card = titleEl.closest(TOP_CARD_SELECTORS) || titleEl.parentElement || root;
+        const nodes = card.querySelectorAll('span, li');
+        for(let i = 0; i < nodes.length && i < 200; i++){
+          const t = (nodes[i].textContent || '').trim();
+          if(t && t.length < 120 && /Région|Region|Belgique|Belgium|Bruxelles|Brussels|Bruxelles-Capitale|Capital/i.test(t)){
             location = t; break;
           }
         }
@@ -240,7 +355,9 @@ return (function(){
     const companyObj = findCompany(root, titleEl);
     const company = companyObj.company || "";
     const companyMethod = companyObj.method || "";
-    const description_html = firstHtmlWithin(root, DESC_SELECTORS) || root.innerHTML || "";
+    // texte compacté dans la page : seul ce texte plafonné traverse le pont WebDriver
+    const descEl = firstElementWithin(root, DESC_SELECTORS);
+    const desc = compactText(descEl || (root === document ? document.body : root));
     const link = window.location.href;
     let job_id = "";
     try{
@@ -248,113 +365,291 @@ return (function(){
       if(m) job_id = m[1];
     }catch(e){}
 
-    return { title: title, company: company, company_method: companyMethod, location: location, description_html: description_html, link: link, job_id: job_id, ts: Date.now() };
+    return { title: title, company: company, company_method: companyMethod, location: location, description: desc.text, sections: desc.sections, description_truncated: desc.truncated, link: link, job_id: job_id, settled: !!descEl, ts: Date.now() };
   }
 
-  function makeHash(obj){
-    const s = (obj.title||"")+"|"+(obj.company||"")+"|"+((obj.description_html||"").slice(0,300));
+  function textHash(s){
     let h = 0;
     for(let i=0;i<s.length;i++){ h = ((h<<5)-h) + s.charCodeAt(i); h |= 0; }
     return h;
   }
+  function makeHash(obj){
+    return textHash((obj.title||"")+"|"+(obj.company||"")+"|"+((obj.description||"").slice(0,300)));
+  }
 
   let lastHash = null;
   function pushIfNew(d){
     try{
-      if(!d) return;
+      if(!d) return false;
       const h = makeHash(d);
       if(h !== lastHash){
         lastHash = h;
+        d.search_key = window.__jobSearchKey;
         window.__jobQueue.push(d);
+        st.pushes++;
+        notify();
         window.__jobWatcherLogs.push({event:"pushed", title:d.title, company:d.company, method:d.company_method, ts:Date.now()});
         console.log("[jobWatcherV3] pushed:", d.title, "@", d.company || "<empty>", "| location:", d.location || "<empty>");
+        return true;
       }
     }catch(e){ console.error(e); }
+    return false;
+  }
+
+  function currentJobId(){
+    const href = window.location.href;
+    const m = href.match(/currentJobId=(\d+)/) || href.match(/jobs\/view\/(\d+)/);
+    return m ? m[1] : null;
   }
 
-  const triggerNow = function(){ try{ const d = getRightPaneDetail(); pushIfNew(d);}catch(e){} };
-  document.addEventListener('click', function(){ setTimeout(triggerNow, 200); }, true);
-  document.addEventListener('mousedown', function(){ setTimeout(triggerNow, 300); }, true);
-  document.addEventListener('mouseup', function(){ setTimeout(triggerNow, 200); }, true);
-  window.addEventListener('keydown', function(ev){ if(ev.shiftKey && ev.key.toLowerCase()==='s'){ const d = getRightPaneDetail(); if(d){ pushIfNew(d); console.log("[jobWatcherV3] manual push:", d.title); } } });
+  // nouvel essai unique après `ms` (description en cours de rendu, envoi du panneau limité)
+  let retryTimer = null;
+  function retryLater(ms){
+    if(retryTimer) return;
+    retryTimer = setTimeout(function(){ retryTimer = null; schedule(); }, ms);
+  }
+
+  // extraction complète seulement si l'offre affichée a changé (ou sur demande) ;
+  // l'id n'est marqué traité qu'une fois sa propre description (sélecteur) envoyée
+  let lastJobId = null, lastDescHash = null, lastPanePush = 0, waitingId = null, waitingSince = 0;
+  function extract(force){
+    const jid = currentJobId();
+    if(!force && jid && jid === lastJobId){ st.skipped++; return; }
+    const t0 = performance.now();
+    const d = getRightPaneDetail();
+    const dt = performance.now() - t0;
+    st.extractions++;
+    st.extract_ms += dt;
+    if(dt > st.extract_ms_max) st.extract_ms_max = dt;
+    if(!d) return;
+    const descHash = textHash(d.description || "");
+    if(!force && jid && descHash === lastDescHash){
+      // nouvel id mais description de l'offre précédente (titre rendu avant elle) : on attend,
+      // au plus DESC_WAIT ms, car deux offres d'une même agence peuvent partager leur texte
+      if(waitingId !== jid){ waitingId = jid; waitingSince = Date.now(); }
+      if(Date.now() - waitingSince < DESC_WAIT){ st.waiting++; retryLater(MIN_GAP); return; }
+    }
+    if(!d.settled && !force && Date.now() - lastPanePush < PANE_GAP){
+      // aucun sélecteur de description : panneau entier, envoyé au plus toutes les PANE_GAP ms
+      retryLater(PANE_GAP);
+      return;
+    }
+    if(pushIfNew(d)){
+      lastDescHash = descHash;
+      if(!d.settled) lastPanePush = Date.now();
+      else if(jid){ lastJobId = jid; st.last_job_id = jid; }
+    }
+    if(force) console.log("[jobWatcherV3] manual push:", d.title);
+  }
 
-  const mo = new MutationObserver(function(muts){ try{ triggerNow(); }catch(e){} });
-  mo.observe(document.body, { childList: true, subtree: true });
+  // n'observe que le panneau de détail (document.body tant qu'il n'existe pas)
+  let observed = null;
+  const mo = new MutationObserver(function(muts){ st.mutations += muts.length; schedule(); });
+  function rescope(){
+    const target = findPane() || document.body;
+    if(target === observed) return;
+    mo.disconnect();
+    observed = target;
+    mo.observe(target, { childList: true, subtree: true });
+    st.rescoped++;
+  }
+
+  // déclencheurs regroupés : au plus une extraction par MIN_GAP ms, sur une frame puis un temps mort
+  let scheduled = false, lastRun = 0;
+  const idle = window.requestIdleCallback || function(cb){ return setTimeout(cb, 50); };
+  function schedule(){
+    st.triggers++;
+    if(scheduled) return;
+    scheduled = true;
+    const frame = document.hidden ? function(cb){ return setTimeout(cb, 0); } : window.requestAnimationFrame;
+    setTimeout(function(){
+      frame(function(){
+        idle(function(){
+          scheduled = false;
+          lastRun = Date.now();
+          try{
+            if(observed === document.body || (observed && !observed.isConnected)) rescope();
+            extract(false);
+          }catch(e){}
+        }, { timeout: 500 });
+      });
+    }, Math.max(0, lastRun + MIN_GAP - Date.now()));
+  }
+
+  document.addEventListener('click', schedule, true);
+  // SHIFT+S : force la capture ; SHIFT+X : annule l'analyse en attente de l'offre affichée
+  window.addEventListener('keydown', function(ev){
+    if(!ev.shiftKey) return;
+    const t = ev.target;
+    if(t && (t.isContentEditable || /^(INPUT|TEXTAREA|SELECT)$/.test(t.tagName || ''))) return;
+    const k = (ev.key || '').toLowerCase();
+    if(k === 's'){ extract(true); }
+    else if(k === 'x'){
+      const jid = currentJobId();
+      if(jid){ window.__jobCancels.push(jid); notify(); console.log("[jobWatcherV3] annulation demandée:", jid); }
+    }
+  });
+  rescope();
 
   (function(history){
     const origPush = history.pushState;
     const origReplace = history.replaceState;
-    history.pushState = function(){ const res = origPush.apply(this, arguments); setTimeout(triggerNow, 250); return res; };
-    history.replaceState = function(){ const res = origReplace.apply(this, arguments); setTimeout(triggerNow, 250); return res; };
+    history.pushState = function(){ const res = origPush.apply(this, arguments); onNavigate(); schedule(); return res; };
+    history.replaceState = function(){ const res = origReplace.apply(this, arguments); onNavigate(); schedule(); return res; };
   })(window.history);
-  window.addEventListener('popstate', function(){ setTimeout(triggerNow, 200); });
+  window.addEventListener('popstate', function(){ onNavigate(); schedule(); });
 
-  setInterval(function(){ triggerNow(); }, 1000);
+  setInterval(schedule, SAFETY_TICK);
+  schedule();
 
   return "injectedV3";
 })();
 """
 
-# -------------------------------------------------
+# Long-poll (execute_async_script) : rend la main dès que __jobQueue reçoit des
+# offres, qu'une annulation est demandée ou que la recherche change, sinon après
+# arguments[0] ms. arguments[2] est le nombre d'offres en attente côté Python
+# (window.__jobBacklog, lu par le pilote automatique). Renvoie null si le watcher
+# a disparu (rechargement complet de la page).
+JS_WAIT_JOBS = r"""
+var done = arguments[arguments.length - 1];
+var timeout = arguments[0], known = arguments[1];
+window.__jobBacklog = arguments[2] || 0;
+if (!window.__jobWatcherInjectedV3 || !window.__jobWaiters) { done(null); return; }
+var finished = false;
+function reply(){
+  if (finished) return;
+  finished = true;
+  var i = window.__jobWaiters.indexOf(reply);
+  if (i >= 0) window.__jobWaiters.splice(i, 1);
+  done({items: window.__jobQueue.splice(0), cancels: (window.__jobCancels || []).splice(0),
+        search_key: window.__jobSearchKey, backlog: window.__jobBacklog,
+        watcher: window.__jobWatcherStats || null, autopilot: window.__autopilot || null});
+}
+if (window.__jobQueue.length || (window.__jobCancels && window.__jobCancels.length) ||
+    window.__jobSearchKey !== known) { reply(); return; }
+window.__jobWaiters.push(reply);
+setTimeout(reply, timeout);
+"""
 
-def load_db():
-    if not os.path.exists(DB_PATH):
-        return {}
-    with open(DB_PATH, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except Exception:
-            return {}
+# Pilote automatique, exécuté dans la page (aucune commande WebDriver pendant le
+# parcours) : clique chaque carte de la liste, attend que le watcher ait capturé
+# l'offre (panneau chargé), fait défiler la liste pour charger les cartes suivantes
+# puis passe à la page de résultats suivante. Progression dans window.__autopilot.
+# Pause tant que la file Python dépasse max_backlog offres (window.__jobBacklog) :
+# un modèle lent ne fait pas déborder la file (MAX_PENDING) pendant le parcours.
+JS_AUTOPILOT = r"""
+var opts = arguments[0] || {};
+if (window.__autopilot && window.__autopilot.running) { return "already"; }
+const CARD_SELECTORS = ['li[data-occludable-job-id]', '.jobs-search-results__list-item', '.job-card-container', '.scaffold-layout__list-item'];
+const LINK_SELECTOR = 'a.job-card-list__title, a.job-card-container__link, a[href*="/jobs/view/"]';
+const LIST_SELECTORS = ['.jobs-search-results-list', '.scaffold-layout__list', '.jobs-search-results'];
+const delay = opts.delay_ms || 4000, settle = opts.settle_ms || 8000, maxPages = opts.max_pages || 10;
+const maxBacklog = opts.max_backlog || 20;
+const ap = window.__autopilot = {running: true, done: false, page: 1, clicked: 0, captured: 0, timeouts: 0,
+                                 paused: false, paused_ms: 0, started: Date.now(), finished: null, error: null};
+const seen = new Set();
+function sleep(ms){ return new Promise(function(r){ setTimeout(r, ms); }); }
+function cards(){
+  for (const s of CARD_SELECTORS) {
+    const found = document.querySelectorAll(s);
+    if (found.length) return Array.from(found);
+  }
+  return [];
+}
+function cardId(card){
+  const direct = card.getAttribute('data-occludable-job-id') || card.getAttribute('data-job-id');
+  if (direct) return direct;
+  const inner = card.querySelector('[data-job-id]');
+  if (inner) return inner.getAttribute('data-job-id');
+  const a = card.querySelector('a[href*="/jobs/view/"]');
+  const m = a ? a.href.match(/jobs\/view\/(\d+)/) : null;
+  return m ? m[1] : null;
+}
+function nextCard(){
+  for (const c of cards()) { const id = cardId(c); if (id && !seen.has(id)) return c; }
+  return null;
+}
+function pushes(){ return window.__jobWatcherStats ? window.__jobWatcherStats.pushes : 0; }
+async function waitCaptured(before, id){
+  const t0 = Date.now();
+  while (Date.now() - t0 < settle) {
+    // nouvelle capture, ou offre déjà affichée et capturée avant le clic
+    if (pushes() > before || (window.__jobWatcherStats && window.__jobWatcherStats.last_job_id === id)) return true;
+    await sleep(100);
+  }
+  return false;
+}
+async function waitBacklog(){
+  // analyses en retard : plus de clic tant que la file Python ne s'est pas vidée
+  const t0 = Date.now();
+  while (ap.running && (window.__jobBacklog || 0) >= maxBacklog) { ap.paused = true; await sleep(500); }
+  if (ap.paused) { ap.paused = false; ap.paused_ms += Date.now() - t0; }
+}
+async function loadMore(){
+  // la liste est virtualisée : défiler jusqu'en bas fait apparaître les cartes suivantes
+  for (const s of LIST_SELECTORS) {
+    const list = document.querySelector(s);
+    if (list) { list.scrollTop = list.scrollHeight; break; }
+  }
+  await sleep(1000);
+  return nextCard();
+}
+async function nextPage(){
+  const page = ap.page + 1;
+  const btn = document.querySelector('button[aria-label="Page ' + page + '"]') ||
+              document.querySelector('li[data-test-pagination-page-btn="' + page + '"] button') ||
+              document.querySelector('.jobs-search-pagination__button--next, button[aria-label="Voir la page suivante"], button[aria-label="View next page"]');
+  if (!btn || btn.disabled) return false;
+  const first = cards().map(cardId).join(',');
+  btn.click();
+  const t0 = Date.now();
+  while (Date.now() - t0 < 10000) {
+    await sleep(250);
+    if (cards().length && cards().map(cardId).join(',') !== first) { ap.page = page; return true; }
+  }
+  return false;
+}
+(async function(){
+  try {
+    while (ap.running) {
+      await waitBacklog();
+      let card = nextCard() || await loadMore();
+      while (card && ap.running) {
+        const id = cardId(card);
+        seen.add(id);
+        card.scrollIntoView({block: 'center'});
+        const before = pushes();
+        (card.querySelector(LINK_SELECTOR) || card).click();
+        ap.clicked++;
+        if (await waitCaptured(before, id)) ap.captured++; else ap.timeouts++;
+        await sleep(delay * (0.75 + Math.random() / 2));
+        await waitBacklog();
+        card = nextCard() || await loadMore();
+      }
+      if (!ap.running || ap.page >= maxPages || !(await nextPage())) break;
+    }
+  } catch (e) { ap.error = String(e); }
+  ap.running = false;
+  ap.done = true;
+  ap.finished = Date.now();
+})();
+return "started";
+"""
 
-def save_db(db):
-    with open(DB_PATH, "w", encoding="utf-8") as f:
-        json.dump(db, f, ensure_ascii=False, indent=2)
+# -------------------------------------------------
 
 def add_job_if_new(job):
-    db = load_db()
-    jid = job.get("job_id") or job.get("link") or f"{job.get('title')}|{job.get('company')}"
-    if jid in db:
+    added, jid = job_store.add_if_new(job)
+    if not added:
         print(f"[DB] Offre déjà présente (id={jid}) -> skip")
         return False
-    db[jid] = job
-    save_db(db)
     print(f"[DB] Offre enregistrée (id={jid})")
     return True
 
-def robust_job_id(job):
-    """
-    Renvoie un id stable pour un job :
-     - si job['job_id'] présent -> retourne
-     - sinon tente d'extraire id depuis link
-     - sinon hash(title|company|location|link)
-    """
-    jid = job.get("job_id")
-    if jid:
-        return str(jid)
-
-    link = (job.get("link") or "")
-    # Try query params common patterns
-    m = re.search(r'(currentJobId|jobId|jobId=|jobs\/view\/)(\d+)', link)
-    if m:
-        # pick numeric part
-        for g in m.groups()[::-1]:
-            if g and g.isdigit():
-                return g
-
-    # Another pattern /jobs/view/123456/
-    m2 = re.search(r'/jobs/(?:view/)?(\d+)', link)
-    if m2:
-        return m2.group(1)
-
-    # fallback deterministic hash
-    key = "|".join([
-        (job.get("title") or "").strip()[:200],
-        (job.get("company") or "").strip()[:120],
-        (job.get("location") or "").strip()[:80],
-        (link or "")[:300]
-    ])
-    h = hashlib.sha256(key.encode("utf-8")).hexdigest()
-    return h[:16]
+def search_fingerprint(key):
+    """Empreinte d'une clé de recherche "path|keywords|geoId|f_TPR|f_WT"."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
 
 def page_fingerprint(driver):
     """Empreinte simple de la recherche (URL + quelques params utiles)."""
@@ -370,7 +665,7 @@ def page_fingerprint(driver):
             "f_WT": qs.get("f_WT", [""])[0] or ""
         }
         s = "|".join([keys["path"], keys["keywords"], keys["geoId"], keys["f_TPR"], keys["f_WT"]])
-        return hashlib.sha256(s.encode("utf-8")).hexdigest()[:12]
+        return search_fingerprint(s)
     except Exception:
         return None
 
@@ -406,113 +701,392 @@ def ensure_watcher_injected(driver, max_attempts=3, sleep_between=0.8):
     print("[watchdog] échec d'injection après tentatives")
     return False
 
-def analysis_worker(worker_id):
-    print(f"[Worker-{worker_id}] Démarré")
-    while True:
-        job = processing_queue.get()
-
-        min_len = (len((job.get("title") or "")) + len((job.get("company") or "")) + len((job.get("description_html") or "")))
-        if min_len < 10:
-            print(f"[Worker-{worker_id}] Offre incomplète / trop courte -> skip (id={job.get('job_id')})")
-            processing_queue.task_done()
-            continue
+def extract_output_text(resp):
+    """Texte de sortie d'une réponse `responses.create`, quel que soit le format renvoyé."""
+    output_text = ""
+    try:
+        output_text = getattr(resp, "output_text", "") or ""
+    except Exception:
+        output_text = ""
 
-        if job is None:
-            print(f"[Worker-{worker_id}] Stop signal reçu")
-            break
+    if not output_text:
+        try:
+            output_text = resp["output"][0]["content"][0]["text"]
+        except Exception:
+            try:
+                output_text = resp["choices"][0]["message"]["content"]
+            except Exception:
+                output_text = str(resp)
+    return output_text
+
+def complete(prompt, oui_mode=OUI_MODE):
+    """Appel LM Studio ; en streaming, s'arrête dès que la décision le permet. Renvoie (texte, complet)."""
+    if not STREAM_DECISION:
+        resp = client.responses.create(model=MODEL_NAME, input=prompt, temperature=TEMPERATURE, top_p=TOP_P)
+        return extract_output_text(resp), True
+    stream = client.responses.create(model=MODEL_NAME, input=prompt, temperature=TEMPERATURE, top_p=TOP_P, stream=True)
+    return read_until_decision(responses_deltas(stream), stream.close, oui_mode, dispatcher.mark_decision)
+
+def cached_llm_call(prompt, oui_mode=OUI_MODE):
+    """
+    Appelle LM Studio, sauf si la même requête (prompt + paramètres) est déjà en cache.
+    Renvoie (texte, complet).
+    """
+    cache_key = make_key(prompt, MODEL_NAME, temperature=TEMPERATURE, top_p=TOP_P)
+    output_text, finished, hit = cached_call(llm_cache, cache_key,
+                                             lambda: dispatcher.call(complete, prompt, oui_mode), MODEL_NAME)
+    if hit:
+        print("[cache] réponse LLM servie depuis le cache")
+    return output_text, finished
+
+def embedding_text(job):
+    return offer_text({name: job.get(key) for key, name in PROMPT_FIELDS.items()})
+
+def job_offer_id(job):
+    return job_key(job)
+
+def release_job(job):
+    """L'offre a quitté le pipeline (jugée ou écartée) : un nouveau clic pourra la remettre en file."""
+    processing_queue.done(job.get("job_id"))
+
+def enqueue(job):
+    """Met l'offre en file de priorité ; un nouveau clic sur une offre en attente la remet en tête."""
+    jid = job["job_id"]
+    dropped_before = processing_queue.dropped
+    status = processing_queue.put(job)
+    dropped = processing_queue.dropped - dropped_before
+    if dropped:
+        print(f"[Main] File pleine ({processing_queue.max_pending} en attente) : {dropped} offre(s) "
+              f"la/les moins prioritaire(s) abandonnée(s)")
+        stats.incr("dropped", dropped)
+    if status == RUNNING:
+        print(f"[Main] Déjà en cours d'analyse -> skip (id={jid})")
+    elif status == DROPPED:
+        print(f"[Main] Offre abandonnée, file pleine (id={jid})")
+    elif status == BUMPED:
+        print(f"[Main] Déjà en attente -> remise en tête (id={jid})")
+        stats.incr("reprioritized")
+    else:
+        print(f"[Main] Mis en queue: {job.get('title')[:120]} | company: {job.get('company') or '<empty>'} | id={jid} | origin_fp={job['origin_fp']} | {len(processing_queue)} en attente")
+
+def cancel_jobs(jids):
+    """Retire de la file les offres dont l'annulation a été demandée dans la page (SHIFT+X)."""
+    for jid in jids or []:
+        if processing_queue.cancel(jid):
+            print(f"[Main] Analyse annulée (id={jid})")
+            stats.incr("cancelled")
+        else:
+            print(f"[Main] Annulation ignorée : offre ni en attente ni connue de la file (id={jid})")
+
+def job_fingerprint(job):
+    return fingerprint(job.get("title"), job.get("description"))
+
+def embedding_score(job):
+    """Similarité de l'offre avec le profil / les offres retenues, ou None si indisponible."""
+    if screen is None or screen.references() is None:
+        return None
+    try:
+        return float(screen.scores([embedding_text(job)])[0])
+    except Exception as e:
+        print("[embeddings] erreur:", e)
+        return None
 
-        global current_fp_global
-        if job.get("origin_fp") != current_fp_global:
-            print(f"[Worker-{worker_id}] Job ignoré : provient d'une recherche différente (origin_fp={job.get('origin_fp')}, current_fp={current_fp_global})")
-            processing_queue.task_done()
-            continue
+# champs ajoutés à la fiche depuis le prompt historique : absents de la référence
+RAW_PROMPT_SKIP = ("sections", "description_truncated", "settled", "search_key")
 
-        print(f"[Worker-{worker_id}] Analyse de {job.get('link') or job.get('job_id') or job.get('title')[:40]}")
-        prompt = f"""
+def raw_prompt(job):
+    """Prompt historique (fiche JSON brute), sert de référence pour mesurer l'économie de tokens."""
+    raw = {k: v for k, v in job.items() if k not in RAW_PROMPT_SKIP}
+    return f"""
 {USER_CONTEXT}
 
 Analyse maintenant l'offre ci-dessus et réponds STRICTEMENT au format demandé.
 Fiche d'offre (JSON) :
-{json.dumps(job, ensure_ascii=False)}
+{json.dumps(raw, ensure_ascii=False)}
 """
-        try:
-            resp = client.responses.create(model=MODEL_NAME, input=prompt, temperature=0.05, top_p=0.8)
-            output_text = ""
-            try:
-                output_text = getattr(resp, "output_text", "") or ""
-            except Exception:
-                output_text = ""
 
-            if not output_text:
-                try:
-                    output_text = resp["output"][0]["content"][0]["text"]
-                except Exception:
-                    try:
-                        output_text = resp["choices"][0]["message"]["content"]
-                    except Exception:
-                        output_text = str(resp)
+def offer_section(job):
+    """Partie propre à l'offre : fiche compacte, sans HTML ni champs internes, dans le budget de tokens."""
+    fields = compact_fields({name: job.get(key) for key, name in PROMPT_FIELDS.items()},
+                            long_field="description", budget=PROMPT_TOKEN_BUDGET)
+    return f"""Analyse maintenant l'offre ci-dessus et réponds STRICTEMENT au format demandé.
+Fiche d'offre (JSON) :
+{json.dumps(fields, ensure_ascii=False)}"""
+
+def build_prompt(job):
+    """
+    Messages système (contexte, identique à chaque appel) + utilisateur (offre) si
+    PROMPT_LAYOUT = "system", sinon le prompt texte historique.
+    """
+    if PROMPT_LAYOUT == "system":
+        return chat_messages(SYSTEM_CONTEXT, offer_section(job))
+    return f"""
+{USER_CONTEXT}
+
+{offer_section(job)}
+"""
+
+def screen_job(job, tag):
+    """
+    Filtres avant le LLM (offre incomplète, autre recherche, pré-filtre, quasi-doublon,
+    embeddings). Renvoie None si l'offre est écartée, sinon (empreinte, offre originale ou None).
+    """
+    min_len = (len((job.get("title") or "")) + len((job.get("company") or "")) + len((job.get("description") or "")))
+    if min_len < 10:
+        print(f"{tag} Offre incomplète / trop courte -> skip (id={job.get('job_id')})")
+        return None
 
-            output_text = output_text.strip()
-            first_line = output_text.splitlines()[0].strip() if output_text else ""
-            rest = "\n".join(output_text.splitlines()[1:]).strip()
+    rule = prefilter.check(job)
+    if rule:
+        print(f"{tag} Rejet par le pré-filtre ({rule}) : {job.get('title')[:60]} | {prefilter.summary()}")
+        stats.set("prefiltered", dict(prefilter.hits))
+        return None
 
-            parsed_analysis = None
-            if rest:
+    fp = job_fingerprint(job)
+    original = near_duplicates.find(fp, job.get("title"), exclude=job_offer_id(job))
+    if original is None:
+        score = embedding_score(job)
+        if score is not None and score < EMBED_MIN_SCORE:
+            print(f"{tag} Rejet par la pré-sélection embeddings (score {score:.3f}) : {job.get('title')[:60]}")
+            stats.incr("embedding_rejected")
+            return None
+    return fp, original
+
+def duplicate_output(original, tag):
+    # republication / même offre vue sur Actiris : pas de nouvel appel au LLM
+    print(f"{tag} Doublon de {original['link']} ({original['source']}) : verdict réutilisé")
+    return f"{original['decision']}\n{original['justification'] or ''}"
+
+def prepare_prompt(job, tag):
+    print(f"{tag} Analyse de {job.get('link') or job.get('job_id') or job.get('title')[:40]}")
+    prompt = build_prompt(job)
+    report = token_report(raw_prompt(job), prompt)
+    print(f"{tag} Prompt : {report['before']} → {report['after']} tokens (-{report['saved']})")
+    return prompt
+
+def parse_output(output_text):
+    """Réponse du modèle -> (texte, première ligne, justification, analyse JSON ou None)."""
+    output_text = output_text.strip()
+    first_line = output_text.splitlines()[0].strip() if output_text else ""
+    rest = "\n".join(output_text.splitlines()[1:]).strip()
+
+    parsed_analysis = None
+    if rest:
+        try:
+            parsed_analysis = json.loads(rest)
+        except Exception:
+            m = re.search(r'(\{.*\})', rest, re.DOTALL)
+            if m:
                 try:
-                    parsed_analysis = json.loads(rest)
+                    parsed_analysis = json.loads(m.group(1))
                 except Exception:
-                    m = re.search(r'(\{.*\})', rest, re.DOTALL)
-                    if m:
-                        try:
-                            parsed_analysis = json.loads(m.group(1))
-                        except Exception:
-                            parsed_analysis = None
-
-            should_save = False
-            if first_line.upper().startswith("OUI"):
-                should_save = True
+                    parsed_analysis = None
+    return output_text, first_line, rest, parsed_analysis
+
+def record_verdict(job, output_text, finished, fp, original, tag):
+    """Interprète la réponse du modèle, met à jour les stats et enregistre l'offre si elle est retenue."""
+    output_text, first_line, rest, parsed_analysis = parse_output(output_text)
+    if decision_of(first_line) is None and not (parsed_analysis and "should_save" in parsed_analysis):
+        # réponse vide ou hors format : pas de verdict, un nouveau clic relancera l'analyse
+        print(f"{tag} Réponse du modèle illisible, offre non jugée : {output_text[:80]!r}")
+        stats.incr("unreadable")
+        return
+
+    should_save = False
+    if first_line.upper().startswith("OUI"):
+        should_save = True
+    else:
+        should_save = False
+
+    if parsed_analysis and "should_save" in parsed_analysis:
+        should_save = bool(parsed_analysis["should_save"])
+
+    stats.incr("duplicates" if original is not None else "total_analyzed")
+    if should_save:
+        stats.incr("retained")
+
+    saved_obj = {
+        "job_id": job.get("job_id"),
+        "link": job.get("link"),
+        "title": job.get("title"),
+        "company": job.get("company"),
+        "location": job.get("location"),
+        "description": job.get("description") or "",   # texte déjà plafonné par la page
+        "sections": job.get("sections") or [],
+        "analysis": {
+            "raw_output": output_text,
+            "first_line": first_line,
+            "parsed": parsed_analysis
+        },
+        "justification_pending": not finished,
+        "duplicate_of": original["link"] if original is not None else None,
+        "should_save": should_save,
+        "analyzed_at": datetime.utcnow().isoformat() + "Z",
+        "applied": False,              # tu avais déjà
+        "source": "linkedin",
+        "application_result": "no_response"   # <-- nouveau champ
+    }
+
+    verdicts.record(job_key(job), "OUI" if should_save else "NON")
+    near_duplicates.add(job_offer_id(job), fp, "linkedin", job.get("link"), job.get("title"),
+                        "OUI" if should_save else "NON", rest, company=job.get("company") or "",
+                        duplicate_of=original["offer_id"] if original is not None else None)
+
+    if should_save:
+        add_job_if_new(saved_obj)
+        if screen is not None and original is None:
+            screen.add_reference(embedding_text(job))
+    else:
+        print(f"{tag} Non recommandé par le modèle.")
+
+def justify_pending():
+    """Génère les justifications différées (OUI_MODE = "defer") des offres retenues."""
+    pending = [job for job in job_store.jobs.values() if job.get("justification_pending")]
+    print(f"📝 {len(pending)} justifications à générer.")
+    for job in pending:
+        try:
+            output_text, finished = cached_llm_call(build_prompt(job), oui_mode="continue")
+        except Exception as e:
+            print(f"[justify] Erreur ({job.get('link')}) : {e}")
+            continue
+        output_text, first_line, rest, parsed_analysis = parse_output(output_text)
+        if decision_of(first_line) is None:
+            print(f"[justify] Réponse illisible ({job.get('link')}) : {output_text[:80]!r}")
+            continue
+        job = dict(job, justification_pending=not finished,
+                   analysis={"raw_output": output_text, "first_line": first_line, "parsed": parsed_analysis})
+        job_store.update(job)
+        print(f"  → {job.get('title')} :", rest)
+
+def analysis_worker(worker_id):
+    tag = f"[Worker-{worker_id}]"
+    print(f"{tag} Démarré")
+    while True:
+        job = processing_queue.get()
+
+        if job is None:
+            print(f"{tag} Stop signal reçu")
+            break
+
+        screened = screen_job(job, tag)
+        if screened is None:
+            release_job(job)
+            continue
+        fp, original = screened
+
+        try:
+            if original is not None:
+                output_text, finished = duplicate_output(original, tag), True
             else:
-                should_save = False
-
-            if parsed_analysis and "should_save" in parsed_analysis:
-                should_save = bool(parsed_analysis["should_save"])
-
-            with stats_lock:
-                stats["total_analyzed"] = stats.get("total_analyzed", 0) + 1
-                if should_save:
-                    stats["retained"] = stats.get("retained", 0) + 1
-                # persist immédiatement (simple)
-                save_stats()
-
-            saved_obj = {
-                "job_id": job.get("job_id"),
-                "link": job.get("link"),
-                "title": job.get("title"),
-                "company": job.get("company"),
-                "location": job.get("location"),
-                "description_html_snippet": (job.get("description_html") or "")[:4000],
-                "analysis": {
-                    "raw_output": output_text,
-                    "first_line": first_line,
-                    "parsed": parsed_analysis
-                },
-                "should_save": should_save,
-                "analyzed_at": datetime.utcnow().isoformat() + "Z",
-                "applied": False,              # tu avais déjà
-                "source": "linkedin",
-                "application_result": "no_response"   # <-- nouveau champ
-            }
+                output_text, finished = cached_llm_call(prepare_prompt(job, tag))
+            record_verdict(job, output_text, finished, fp, original, tag)
+            stats.set("llm_dispatcher", dispatcher.stats())
 
-            if should_save:
-                with db_lock:
-                    add_job_if_new(saved_obj)
+        except Exception as e:
+            print(f"{tag} Erreur durant l'analyse: {e}")
+
+        release_job(job)
+
+# ---------- Moteur asyncio (--engine asyncio) ----------
+# Une seule boucle d'évènements : capture, analyses (AsyncOpenAI, concurrence adaptative
+# jusqu'à ASYNC_CONCURRENCY appels), persistance et stats sont des tâches coopérantes. Les appels
+# bloquants (Selenium, SQLite, fsync) passent par le pool de threads partagé d'asyncio.
+
+async def acomplete(aclient, adispatcher, prompt):
+    """Version asynchrone de `complete`."""
+    if not STREAM_DECISION:
+        resp = await aclient.responses.create(model=MODEL_NAME, input=prompt, temperature=TEMPERATURE, top_p=TOP_P)
+        return extract_output_text(resp), True
+    stream = await aclient.responses.create(model=MODEL_NAME, input=prompt, temperature=TEMPERATURE, top_p=TOP_P,
+                                            stream=True)
+    return await aread_until_decision(aresponses_deltas(stream), stream.close, OUI_MODE, adispatcher.mark_decision)
+
+async def acached_llm_call(aclient, adispatcher, prompt):
+    """Version asynchrone de `cached_llm_call`, bornée par le dispatcher adaptatif `adispatcher`."""
+    cache_key = make_key(prompt, MODEL_NAME, temperature=TEMPERATURE, top_p=TOP_P)
+    output_text, finished, hit = await acached_call(
+        llm_cache, cache_key, lambda: adispatcher.acall(acomplete, aclient, adispatcher, prompt), MODEL_NAME)
+    if hit:
+        print("[cache] réponse LLM servie depuis le cache")
+    return output_text, finished
+
+async def capture_task(driver):
+    last_fp = current_fp_global
+    while True:
+        captured, last_fp = await asyncio.to_thread(capture_jobs, driver, last_fp)
+        for job in captured:
+            enqueue(job)
+        if CAPTURE_MODE == "poll":
+            await asyncio.sleep(POLL_INTERVAL)
+
+async def analysis_task(task_id, aclient, adispatcher, results):
+    tag = f"[Task-{task_id}]"
+    while True:
+        job = await processing_queue.aget()
+        if job is None:
+            return
+        try:
+            screened = await asyncio.to_thread(screen_job, job, tag)
+            if screened is None:
+                release_job(job)
+                continue
+            fp, original = screened
+            if original is not None:
+                output_text, finished = duplicate_output(original, tag), True
             else:
-                print(f"[Worker-{worker_id}] Non recommandé par le modèle.")
+                # tokenisation du prompt (CPU) hors de la boucle d'évènements
+                prompt = await asyncio.to_thread(prepare_prompt, job, tag)
+                output_text, finished = await acached_llm_call(aclient, adispatcher, prompt)
+            await results.put((job, output_text, finished, fp, original, tag))
+            stats.set("llm_dispatcher", adispatcher.stats())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"{tag} Erreur durant l'analyse: {e}")
+            release_job(job)
 
+async def persistence_task(results):
+    """Seul écrivain : enregistre les verdicts dans l'ordre d'arrivée (None = fin)."""
+    while True:
+        item = await results.get()
+        if item is None:
+            return
+        try:
+            await asyncio.to_thread(record_verdict, *item)
         except Exception as e:
-            print(f"[Worker-{worker_id}] Erreur durant l'analyse: {e}")
+            print(f"{item[-1]} Erreur d'enregistrement: {e}")
+        release_job(item[0])
 
-        processing_queue.task_done()
+async def stats_task():
+    while True:
+        await asyncio.sleep(STATS_FLUSH_INTERVAL)
+        await asyncio.to_thread(stats.flush)
+
+async def run_async(driver):
+    aclient = AsyncOpenAI(base_url=LLM_BASE_URL, api_key="lm-studio")
+    adispatcher = AdaptiveDispatcher(max_limit=ASYNC_CONCURRENCY, name="linkedin-llm-async")
+    results = asyncio.Queue()
+    stats.autoflush = False
+
+    workers = [asyncio.create_task(capture_task(driver), name="capture")]
+    workers += [asyncio.create_task(analysis_task(i + 1, aclient, adispatcher, results), name=f"analysis-{i + 1}")
+                for i in range(ASYNC_CONCURRENCY)]
+    background = [asyncio.create_task(stats_task(), name="stats")]
+    persister = asyncio.create_task(persistence_task(results), name="persistence")
+    print(f"[async] {ASYNC_CONCURRENCY} analyses simultanées au maximum (limite adaptative).")
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        # Ctrl+C : capture et analyses annulées (flux LLM fermés), puis les verdicts
+        # déjà obtenus sont enregistrés avant de rendre la main
+        for t in workers + background:
+            t.cancel()
+        await asyncio.gather(*workers, *background, return_exceptions=True)
+        results.put_nowait(None)
+        await persister
+        await aclient.close()
+        print(adispatcher.describe())
+        adispatcher.shutdown(wait=False)
 
 def inject_listener(driver):
     try:
@@ -533,18 +1107,103 @@ def inject_listener(driver):
 
 def poll_job_queue(driver):
     js = """
+    window.__jobBacklog = arguments[0] || 0;
+    var cancels = (window.__jobCancels || []).splice(0);
     var q = window.__jobQueue || [];
-    if (q.length === 0) return [];
+    if (q.length === 0) return {items: [], cancels: cancels};
     var items = q.slice();
     window.__jobQueue = [];
-    return items;
+    return {items: items, cancels: cancels};
     """
     try:
-        items = driver.execute_script(js)
-        return items or []
+        res = driver.execute_script(js, len(processing_queue)) or {}
     except Exception as e:
         print("[poll_job_queue] exception:", e)
         return []
+    cancel_jobs(res.get("cancels"))
+    return res.get("items") or []
+
+def wait_for_jobs(driver, search_key):
+    """
+    Canal push : attend côté page (au plus WAIT_TIMEOUT s) de nouvelles offres ou un
+    changement de recherche. Renvoie la réponse de la page (items, search_key, compteurs
+    watcher / autopilot), ou None si le watcher est absent ou que l'attente a échoué
+    (navigation complète, fenêtre fermée...).
+    """
+    try:
+        res = driver.execute_async_script(JS_WAIT_JOBS, int(WAIT_TIMEOUT * 1000), search_key, len(processing_queue))
+    except Exception as e:
+        print("[wait_for_jobs] exception:", e)
+        return None
+    return res or None
+
+def start_autopilot(driver):
+    """Lance (ou relance après un rechargement) le parcours automatique de la liste de résultats."""
+    opts = {"delay_ms": int(AUTOPILOT_DELAY * 1000), "settle_ms": int(AUTOPILOT_SETTLE * 1000),
+            "max_pages": AUTOPILOT_MAX_PAGES, "max_backlog": AUTOPILOT_MAX_BACKLOG}
+    try:
+        res = driver.execute_script(JS_AUTOPILOT, opts)
+    except Exception as e:
+        print("[autopilot] exception:", e)
+        return
+    if autopilot_state["started_at"] is None:
+        autopilot_state["started_at"] = time.time()
+        autopilot_state["analyzed_at_start"] = stats.snapshot().get("total_analyzed", 0)
+        autopilot_state["dropped_at_start"] = processing_queue.dropped
+    print(f"[autopilot] {res} (une offre toutes les ~{AUTOPILOT_DELAY:g}s, {AUTOPILOT_MAX_PAGES} pages max)")
+
+def autopilot_rates(status):
+    """Offres capturées / analysées par minute depuis le lancement du pilote automatique."""
+    # horloge de la page pour le parcours (figée à la fin), horloge locale pour les analyses
+    browsing = ((status.get("finished") or time.time() * 1000) - status.get("started", 0)) / 60000
+    minutes = (time.time() - autopilot_state["started_at"]) / 60
+    analyzed = stats.snapshot().get("total_analyzed", 0) - autopilot_state["analyzed_at_start"]
+    return {"page": status.get("page"), "clicked": status.get("clicked"), "captured": status.get("captured"),
+            "timeouts": status.get("timeouts"), "analyzed": analyzed,
+            "dropped": processing_queue.dropped - autopilot_state["dropped_at_start"],
+            "paused_s": round((status.get("paused_ms") or 0) / 1000, 1),
+            "captured_per_min": round(status.get("captured", 0) / max(browsing, 1e-6), 2),
+            "analyzed_per_min": round(analyzed / max(minutes, 1e-6), 2)}
+
+def track_autopilot(driver, status):
+    """Suit la progression du pilote automatique ; le relance si la page a été rechargée."""
+    if not autopilot_state["enabled"] or autopilot_state["reported"]:
+        return
+    if autopilot_state["finished"]:
+        # parcours terminé : bilan final une fois toutes les offres capturées analysées
+        if processing_queue.busy() == 0:
+            autopilot_state["reported"] = True
+            rates = dict(autopilot_state["rates"], **autopilot_rates(autopilot_state["status"]))
+            stats.set("autopilot", rates)
+            print(f"[autopilot] bilan : {rates['captured']} offres capturées ({rates['captured_per_min']}/min), "
+                  f"{rates['analyzed']} analysées ({rates['analyzed_per_min']}/min), "
+                  f"pause file pleine {rates['paused_s']}s")
+            if rates["dropped"]:
+                print(f"[autopilot] ⚠️ {rates['dropped']} offres abandonnées faute de place dans la file : "
+                      f"recherche incomplètement analysée")
+        return
+    if status is None:
+        if autopilot_state["restarts"] >= AUTOPILOT_RESTARTS:
+            print("[autopilot] abandon : trop de rechargements de la page")
+            autopilot_state["enabled"] = False
+            return
+        autopilot_state["restarts"] += 1
+        start_autopilot(driver)
+        return
+    rates = autopilot_rates(status)
+    if status.get("captured") != autopilot_state["last_captured"]:
+        autopilot_state["last_captured"] = status.get("captured")
+        stats.set("autopilot", rates)
+        print(f"[autopilot] page {rates['page']} | {rates['clicked']} cliquées, {rates['captured']} capturées "
+              f"({rates['captured_per_min']}/min) | {rates['analyzed']} analysées ({rates['analyzed_per_min']}/min)"
+              + (" | en pause : file d'analyse pleine" if status.get("paused") else ""))
+    if status.get("done"):
+        autopilot_state.update(finished=True, status=status, rates=rates)
+        if status.get("error"):
+            print("[autopilot] erreur dans la page :", status["error"])
+        print(f"[autopilot] parcours terminé : {rates['captured']} offres capturées sur {rates['page']} page(s) "
+              f"({rates['captured_per_min']}/min, {rates['timeouts']} sans capture), "
+              f"{processing_queue.busy()} encore à analyser")
 
 def create_firefox_driver():
     opts = Options()
@@ -572,76 +1231,154 @@ def create_firefox_driver():
     driver = webdriver.Firefox(options=opts)
     return driver
 
-def main():
+def capture_jobs(driver, last_fp):
+    """
+    Un passage de surveillance : détecte un changement de recherche puis vide la file
+    JS de la page. Renvoie (offres à analyser, empreinte de la recherche courante).
+    """
+    global current_fp_global, current_search_key
+    if CAPTURE_MODE == "push":
+        res = wait_for_jobs(driver, current_search_key)
+        if res is None:
+            # page rechargée : le watcher est réinjecté, l'attente reprend au passage suivant
+            ensure_watcher_injected(driver)
+            time.sleep(POLL_INTERVAL)
+            return [], last_fp
+        items, current_search_key, watcher = res.get("items") or [], res.get("search_key"), res.get("watcher")
+        cancel_jobs(res.get("cancels"))
+        track_autopilot(driver, res.get("autopilot"))
+        if watcher:
+            # coût du watcher dans l'onglet (mutations, extractions, ms passées à extraire)
+            stats.set("watcher", watcher)
+        cur_fp = search_fingerprint(current_search_key) if current_search_key is not None else last_fp
+    else:
+        # detect search/navigation change
+        try:
+            cur_fp = page_fingerprint(driver)
+        except Exception:
+            cur_fp = None
+
+    if cur_fp != last_fp:
+        print(f"[main] Détecté changement de page/search (fp: {last_fp} -> {cur_fp})")
+        last_fp = cur_fp
+        current_fp_global = cur_fp
+        # les offres de l'ancienne recherche restent en file, derrière la nouvelle
+        processing_queue.set_search(cur_fp)
+
+        ensure_watcher_injected(driver)
+
+    if CAPTURE_MODE != "push":
+        items = poll_job_queue(driver)
+        if autopilot_state["enabled"]:
+            try:
+                track_autopilot(driver, driver.execute_script("return window.__autopilot || null;"))
+            except Exception as e:
+                print("[autopilot] exception:", e)
+    if items:
+        print(f"[Main] {len(items)} nouvel(s) objet(s) dans la queue.")
+    fresh = []
+    for job in items:
+        job.setdefault("title", "")
+        job.setdefault("company", "")
+        job.setdefault("location", "")
+        job.setdefault("description", "")
+        job.setdefault("link", job.get("link") or "")
+        job.setdefault("job_id", job.get("job_id") or None)
+
+        # attach origin fingerprint to be able to detect source search
+        # (push : clé relevée par la page au moment de la capture)
+        job['origin_fp'] = search_fingerprint(job["search_key"]) if job.get("search_key") is not None else last_fp
+
+        # identifiant canonique (le même que jobs_db.json et le dashboard)
+        jid = job_key(job)
+        job["job_id"] = jid
+
+        decision = verdicts.get(jid)
+        if decision is not None:
+            print(f"[Main] Déjà analysée ({decision}) -> skip (id={jid})")
+            stats.incr("already_analyzed")
+            continue
+        fresh.append(job)
+    return fresh, last_fp
+
+def main(engine=ENGINE, autopilot=AUTOPILOT):
     driver = create_firefox_driver()
     print("Ouvre LinkedIn dans la fenêtre Firefox qui vient de s'ouvrir.")
     driver.get(LINKEDIN_SEARCH_URL)
+    # une attente du canal push ne doit pas être coupée par le timeout de script
+    driver.set_script_timeout(WAIT_TIMEOUT + 5)
     time.sleep(2)
 
     # use watchdog-injection (tries to inject or verify)
     ensure_watcher_injected(driver)
 
-    # start workers
+    # compteurs consultables par le dashboard sans lire stats.json
+    stats.serve()
+
+    # start workers (le moteur asyncio lance ses propres tâches)
     workers = []
-    for i in range(ANALYSIS_WORKERS):
+    for i in range(ANALYSIS_WORKERS if engine == "threads" else 0):
         t = threading.Thread(target=analysis_worker, args=(i+1,), daemon=True)
         t.start()
         workers.append(t)
 
-    print("Surveillance démarrée. Clique sur une offre (ou SHIFT+S pour forcer).")
+    print("Surveillance démarrée. Clique sur une offre (SHIFT+S pour forcer, SHIFT+X pour annuler son analyse).")
+    if autopilot:
+        autopilot_state["enabled"] = True
+        start_autopilot(driver)
 
     last_fp = page_fingerprint(driver)
 
     global current_fp_global
     current_fp_global = last_fp
+    processing_queue.set_search(last_fp)
 
     print(f"[main] fingerprint initiale: {last_fp}")
 
     try:
-        while True:
-            # detect search/navigation change
-            try:
-                cur_fp = page_fingerprint(driver)
-            except Exception:
-                cur_fp = None
-
-            if cur_fp != last_fp:
-                print(f"[main] Détecté changement de page/search (fp: {last_fp} -> {cur_fp})")
-                last_fp = cur_fp
-                current_fp_global = cur_fp
-                
-                ensure_watcher_injected(driver)
-
-            items = poll_job_queue(driver)
-            if items:
-                print(f"[Main] {len(items)} nouvel(s) objet(s) dans la queue.")
-            for job in items:
-                job.setdefault("title", "")
-                job.setdefault("company", "")
-                job.setdefault("location", "")
-                job.setdefault("description_html", "")
-                job.setdefault("link", job.get("link") or "")
-                job.setdefault("job_id", job.get("job_id") or None)
-
-                # attach origin fingerprint to be able to detect source search
-                job['origin_fp'] = last_fp
-
-                # generate robust job id
-                jid = robust_job_id(job)
-                job["job_id"] = jid
-
-                print(f"[Main] Mis en queue: {job.get('title')[:120]} | company: {job.get('company') or '<empty>'} | id={jid} | origin_fp={job['origin_fp']}")
-                processing_queue.put(job)
-            time.sleep(POLL_INTERVAL)
+        if engine == "asyncio":
+            asyncio.run(run_async(driver))
+        else:
+            while True:
+                jobs, last_fp = capture_jobs(driver, last_fp)
+                for job in jobs:
+                    enqueue(job)
+                if CAPTURE_MODE == "poll":
+                    time.sleep(POLL_INTERVAL)
     except KeyboardInterrupt:
         print("Arrêt demandé (Ctrl+C). Fermeture...")
     finally:
-        for _ in workers:
-            processing_queue.put(None)
+        processing_queue.close()
         for t in workers:
             t.join(timeout=2)
+        if engine == "threads":
+            print(dispatcher.describe())
         driver.quit()
+        job_store.close()
+        verdicts.close()
+        stats.close()
         print("Terminé.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Surveillance LinkedIn et analyse des offres avec LM Studio.")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default=ENGINE,
+                        help="threads : un thread par worker ; asyncio : tâches coopérantes (AsyncOpenAI)")
+    parser.add_argument("--autopilot", action="store_true", default=AUTOPILOT,
+                        help="parcourt seul la liste de résultats (clic sur chaque offre, pages suivantes)")
+    parser.add_argument("--autopilot-delay", type=float, default=AUTOPILOT_DELAY,
+                        help="secondes entre deux offres en pilote automatique")
+    parser.add_argument("--autopilot-pages", type=int, default=AUTOPILOT_MAX_PAGES,
+                        help="pages de résultats parcourues au plus")
+    parser.add_argument("--justify", action="store_true",
+                        help="génère les justifications différées des offres retenues, sans ouvrir LinkedIn")
+    args = parser.parse_args()
+    AUTOPILOT_DELAY = args.autopilot_delay
+    AUTOPILOT_MAX_PAGES = args.autopilot_pages
+    if args.justify:
+        try:
+            justify_pending()
+        finally:
+            job_store.close()
+            verdicts.close()
+    else:
+        main(engine=args.engine, autopilot=args.autopilot)
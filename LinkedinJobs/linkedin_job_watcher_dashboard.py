@@ -3,8 +3,14 @@ import sqlite3
 import os
 import json
 import unicodedata
+import sys
+import urllib.request
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.near_duplicates import NearDuplicateIndex
+from job_store import job_key
+
 # ******************************
 # FULL VIBE CODED DASHBOARD IN FLASK
 # ******************************
@@ -13,6 +19,7 @@ APP_DIR = os.path.dirname(os.path.abspath(__file__))
 SQLITE_DB_PATH = os.path.join(APP_DIR, 'jobs.db')          # fichier sqlite
 JSON_PATH = os.path.join(APP_DIR, 'jobs_db.json')          # export/import JSON
 STATS_PATH = os.path.join(APP_DIR, 'stats.json')          # stats (total_analyzed, retained)
+STATS_URL = 'http://127.0.0.1:5051/stats'                  # compteurs en direct du moniteur (s'il tourne)
 
 app = Flask(__name__)
 app.config['JSON_SORT_KEYS'] = False
@@ -26,6 +33,14 @@ def load_json(path):
     except Exception:
         return {}
 
+def load_stats():
+    """Compteurs en direct du moniteur s'il tourne, sinon le dernier stats.json écrit."""
+    try:
+        with urllib.request.urlopen(STATS_URL, timeout=0.3) as res:
+            return json.loads(res.read().decode('utf-8'))
+    except Exception:
+        return load_json(STATS_PATH)
+
 def save_db_json(db_dict):
     """Sauvegarde jobs_db.json (utilisé pour l'import/export)."""
     try:
@@ -101,21 +116,11 @@ def import_json_to_db():
     inserted = 0
     # support dict or list format
     items = data.items() if isinstance(data, dict) else enumerate(data)
-    for key, job in items:
-        if isinstance(data, dict):
-            j = job
-            jid = key
-        else:
-            j = job
-            jid = job.get('job_id') or job.get('link') or None
+    for key, j in items:
+        # même identifiant canonique que le moniteur (job_store.job_key)
+        jid = job_key(j)
 
-        jid = (j.get('job_id') or j.get('link') or jid) if isinstance(j, dict) else jid
-        if not jid:
-            jid = (j.get('title','') + '|' + j.get('company','')).strip()[:200]
-
-        cur = db.execute('SELECT 1 FROM jobs WHERE job_id = ?', (jid,))
-        if cur.fetchone():
-            continue
+        existing = db.execute('SELECT analysis_raw FROM jobs WHERE job_id = ?', (jid,)).fetchone()
 
         title = j.get('title') or ''
         company = j.get('company') or ''
@@ -123,7 +128,7 @@ def import_json_to_db():
         # remove any characters that is before this exact string " - "
         location = location.split(" - ", 1)[-1] if " - " in location else location
         link = j.get('link') or ''
-        desc = j.get('description_html') or ''
+        desc = j.get('description') or j.get('description_html') or j.get('description_html_snippet') or ''
         source = j.get('source') or 'json'
         analysis = j.get('analysis') if isinstance(j.get('analysis'), dict) else None
         relevance = None
@@ -140,6 +145,13 @@ def import_json_to_db():
             reasons = json.dumps(j.get('reasons'), ensure_ascii=False) if j.get('reasons') else None
             raw = json.dumps(j, ensure_ascii=False)
 
+        if existing:
+            # analyse complétée depuis l'import (justification différée, --justify du moniteur)
+            if analysis and raw != existing[0]:
+                db.execute('UPDATE jobs SET relevance_score = ?, reasons = ?, analysis_raw = ? WHERE job_id = ?',
+                           (relevance, reasons, raw, jid))
+            continue
+
         added_at = j.get('scraped_at') or j.get('analyzed_at') or datetime.utcnow().isoformat() + 'Z'
 
         db.execute(
@@ -289,6 +301,11 @@ INDEX_HTML = '''
                 <div>
                   <a href="{{ job['link'] }}" target="_blank" class="text-lg font-semibold text-gray-900 hover:text-indigo-600">{{ job['title'] }}</a>
                   <div class="text-sm muted mt-1">{{ job['company'] }} • {{ job['location'] }}</div>
+                  {% if job['duplicates'] %}
+                    <div class="text-xs muted mt-1">Doublons :
+                      {% for d in job['duplicates'] %}<a href="{{ d['link'] }}" target="_blank" class="text-indigo-600 hover:underline">{{ d['source'] }}</a>{{ ', ' if not loop.last }}{% endfor %}
+                    </div>
+                  {% endif %}
                 </div>
                 <div class="text-right">
                   <div class="text-sm muted">Ajouté</div>
@@ -520,6 +537,8 @@ def index():
     cur = db.execute(q, params)
     rows = cur.fetchall()
 
+    # autres publications de la même offre (index des quasi-doublons partagé avec Actiris)
+    near_duplicates = NearDuplicateIndex()
     jobs = []
     for r in rows:
         reasons = None
@@ -547,12 +566,14 @@ def index():
             'added_at': added_at_fmt,
             'applied': bool(r['applied']),
             'response': r['response'],
-            'role_letter': role_letter
+            'role_letter': role_letter,
+            'duplicates': near_duplicates.duplicates(r['job_id'])
         })
+    near_duplicates.close()
 
 
     # total analysées toujours lu depuis stats.json (si tu veux garder ce compteur LLM)
-    stats = load_json(STATS_PATH)
+    stats = load_stats()
     total_analyzed = int(stats.get('total_analyzed', 0) or 0)
 
     # retained = nombre d'offres actuellement présentes en base et NON supprimées
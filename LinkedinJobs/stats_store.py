@@ -0,0 +1,117 @@
+# stats_store.py
+
+import json
+import os
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from job_store import atomic_write_json
+
+# *********************
+# Compteurs du moniteur LinkedIn gardés en mémoire : les workers ne font
+# qu'incrémenter sous verrou, stats.json est réécrit de façon atomique
+# (fichier temporaire + os.replace) toutes les FLUSH_INTERVAL secondes ou
+# toutes les FLUSH_EVERY mises à jour, et à l'arrêt.
+# Les compteurs courants sont aussi servis en JSON sur
+# http://127.0.0.1:STATS_PORT/stats (lus par le dashboard sans passer par le disque).
+# *********************
+
+STATS_PATH = "stats.json"
+FLUSH_INTERVAL = 5.0
+FLUSH_EVERY = 50
+STATS_PORT = 5051
+
+
+class Stats:
+    def __init__(self, path=STATS_PATH, flush_interval=FLUSH_INTERVAL, flush_every=FLUSH_EVERY):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.data = {"total_analyzed": 0, "retained": 0, "last_updated": None}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = 0
+        self.timer = None
+        self.autoflush = True    # False : l'appelant se charge des écritures périodiques
+        self.server = None
+        try:
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data.update(json.load(f))
+        except Exception:
+            pass
+
+    def incr(self, key, n=1):
+        with self.lock:
+            self.data[key] = self.data.get(key, 0) + n
+            flush_now = self._changed()
+        if flush_now:
+            self.flush()
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            flush_now = self._changed()
+        if flush_now:
+            self.flush()
+
+    def _changed(self):
+        """À appeler sous verrou ; vrai si le seuil de mises à jour est atteint."""
+        self.data["last_updated"] = datetime.utcnow().isoformat() + "Z"
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            return True
+        if self.autoflush and self.timer is None:
+            self.timer = threading.Timer(self.flush_interval, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+        return False
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.data)
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pending:
+                return
+            self.pending = 0
+            snapshot = dict(self.data)
+        with self.flush_lock:
+            try:
+                atomic_write_json(self.path, snapshot)
+            except Exception as e:
+                print("[stats] save error:", e)
+
+    def serve(self, port=STATS_PORT):
+        """Expose les compteurs en JSON sur 127.0.0.1:`port` (thread daemon)."""
+        stats = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_GET(self):
+                data = json.dumps(stats.snapshot(), ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        try:
+            self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        except OSError as e:
+            print(f"[stats] port {port} indisponible :", e)
+            return
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="stats-http").start()
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.flush()
@@ -0,0 +1 @@
+# Modules partagés par ActirisJobs et LinkedinJobs.
@@ -0,0 +1,151 @@
+# embeddings.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from common.prompt_builder import compact_fields
+
+# *********************
+# Pré-sélection par similarité d'embeddings (endpoint /v1/embeddings de LM Studio).
+# Chaque offre est comparée au contexte utilisateur et aux offres déjà retenues
+# (cosinus, calcul vectorisé NumPy) ; seules les mieux classées passent au LLM.
+# Les embeddings sont mis en cache par texte et modèle (SQLite).
+# *********************
+
+EMBEDDING_MODEL = "text-embedding-nomic-embed-text-v1.5"
+EMBED_BATCH_SIZE = 32
+EMBED_MAX_TOKENS = 512       # texte d'offre tronqué avant embedding
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embeddings.sqlite")
+
+
+def _key(model, text):
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def offer_text(fields, long_field="description"):
+    """Texte compact d'une offre pour l'embedding (mêmes nettoyages que le prompt, budget réduit)."""
+    compact = compact_fields(fields, long_field=long_field, budget=EMBED_MAX_TOKENS)
+    return "\n".join(f"{key} : {value}" for key, value in compact.items())
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class RelevanceScreen:
+    def __init__(self, client, model=EMBEDDING_MODEL, context_text="", path=CACHE_PATH, namespace="default"):
+        self.client = client
+        self.model = model
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript('''
+        CREATE TABLE IF NOT EXISTS embeddings (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            vector BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS reference_offers (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (namespace, key)
+        );
+        ''')
+        self.db.commit()
+        self.context_text = context_text
+        self._references = None   # matrice (k, d) normalisée, recalculée à la demande
+
+    # --- cache ---
+
+    def _cached(self, keys):
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self.db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _store(self, items):
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [(key, self.model, vec.astype(np.float32).tobytes()) for key, vec in items]
+            )
+            self.db.commit()
+
+    def embed(self, texts):
+        """Matrice (n, d) des embeddings normalisés de `texts` ; seuls les textes absents du cache sont envoyés."""
+        keys = [_key(self.model, t) for t in texts]
+        vectors = self._cached(keys)
+        missing = list(dict.fromkeys(k for k in keys if k not in vectors))
+        by_key = dict(zip(keys, texts))
+        for i in range(0, len(missing), EMBED_BATCH_SIZE):
+            batch = missing[i:i + EMBED_BATCH_SIZE]
+            resp = self.client.embeddings.create(model=self.model, input=[by_key[k] for k in batch])
+            new = [(k, np.asarray(d.embedding, dtype=np.float32)) for k, d in zip(batch, resp.data)]
+            self._store(new)
+            vectors.update(new)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return _normalize(np.vstack([vectors[k] for k in keys]))
+
+    # --- références (contexte utilisateur + offres retenues) ---
+
+    def add_reference(self, text):
+        """Ajoute une offre retenue aux références (persistant)."""
+        self.embed([text])
+        with self.lock:
+            self.db.execute("INSERT OR IGNORE INTO reference_offers (namespace, key) VALUES (?, ?)",
+                            (self.namespace, _key(self.model, text)))
+            self.db.commit()
+        self._references = None
+
+    def references(self):
+        if self._references is None:
+            with self.lock:
+                keys = [k for (k,) in self.db.execute(
+                    "SELECT r.key FROM reference_offers r JOIN embeddings e ON e.key = r.key"
+                    " WHERE r.namespace = ? AND e.model = ?", (self.namespace, self.model)).fetchall()]
+            matrices = []
+            if self.context_text:
+                matrices.append(self.embed([self.context_text]))
+            stored = self._cached(keys)
+            if stored:
+                matrices.append(_normalize(np.vstack(list(stored.values()))))
+            self._references = np.vstack(matrices) if matrices else None
+        return self._references
+
+    # --- scores ---
+
+    def scores(self, texts):
+        """Similarité cosinus maximale de chaque texte avec les références (vecteur de taille n)."""
+        refs = self.references()
+        if refs is None or not texts:
+            return np.ones(len(texts), dtype=np.float32)
+        return (self.embed(texts) @ refs.T).max(axis=1)
+
+    def select_top(self, texts, fraction):
+        """Indices des `fraction` meilleurs textes (au moins un), et le vecteur des scores."""
+        scores = self.scores(texts)
+        if self.references() is None:
+            # rien à quoi comparer : tout passe au LLM
+            return list(range(len(texts))), scores
+        if not len(texts):
+            return [], scores
+        keep = max(1, int(round(len(texts) * fraction)))
+        order = np.argsort(-scores)[:keep]
+        return sorted(order.tolist()), scores
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,200 @@
+# fake_lmstudio.py
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# *********************
+# Serveur factice compatible OpenAI pour tester les pipelines sans LM Studio.
+#   python common/fake_lmstudio.py --port 1234 --capacity 3 --latency 0.5
+# Au-delà de `capacity` requêtes simultanées, la latence croît linéairement
+# (comme un modèle local saturé) ; `--error-rate` injecte des erreurs 503.
+# Avec `stream: true`, la réponse est envoyée mot par mot (`--token-delay`).
+# `--prefill-rate` simule le calcul du prompt (caractères / seconde) avec un
+# cache de préfixe à un emplacement, comme llama.cpp : seule la partie qui
+# diffère du prompt précédent est recalculée.
+# *********************
+
+
+def fake_answer(prompt):
+    """Réponse déterministe : OUI pour environ une offre sur trois."""
+    h = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    decision = "OUI" if h % 3 == 0 else "NON"
+    justification = " ".join(["Justification factice générée par fake_lmstudio."] * 8)
+    return f"{decision}\n{justification} ({h % 1000})"
+
+
+def fake_embedding(text, dim=64):
+    """Sac de mots haché : des textes qui partagent des mots ont un cosinus élevé."""
+    vec = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        vec[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % dim] += 1.0
+    return vec
+
+
+def tokens(text):
+    """Découpe grossière en "tokens" (mots + séparateurs) pour le streaming."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class FakeLMStudio(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, capacity=2, latency=0.5, error_rate=0.0, token_delay=0.02, prefill_rate=0.0):
+        super().__init__(address, Handler)
+        self.prefill_rate = prefill_rate
+        self.cached_prompt = ""
+        self.capacity = capacity
+        self.latency = latency
+        self.error_rate = error_rate
+        self.token_delay = token_delay
+        self.aborted = 0
+        self.in_flight = 0
+        self.served = 0
+        self.lock = threading.Lock()
+
+    def service_time(self):
+        with self.lock:
+            load = self.in_flight
+        return self.latency * max(1.0, load / self.capacity)
+
+    def prefill_time(self, prompt):
+        """Durée de calcul des caractères de `prompt` absents du cache de préfixe."""
+        if not self.prefill_rate:
+            return 0.0
+        with self.lock:
+            cached = len(os.path.commonprefix([self.cached_prompt, prompt]))
+            self.cached_prompt = prompt
+        return (len(prompt) - cached) / self.prefill_rate
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_sse(self, events):
+        """Envoie des évènements SSE un par un ; s'arrête si le client coupe la connexion."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for event in events:
+                data = event if isinstance(event, str) else json.dumps(event, ensure_ascii=False)
+                self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(self.server.token_delay)
+        except (BrokenPipeError, ConnectionResetError):
+            with self.server.lock:
+                self.server.aborted += 1
+        self.close_connection = True
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with server.lock:
+            server.in_flight += 1
+            server.served += 1
+            n = server.served
+        try:
+            time.sleep(server.service_time())
+            if server.error_rate and (n % max(1, int(1 / server.error_rate))) == 0:
+                self._send_json(503, {"error": {"message": "model overloaded"}})
+                return
+            self.handle_endpoint(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def handle_endpoint(self, body):
+        model = body.get("model", "fake")
+        created = int(time.time())
+        stream = bool(body.get("stream"))
+        if self.path.endswith("/chat/completions"):
+            prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+            time.sleep(self.server.prefill_time(json.dumps(body.get("messages", []), ensure_ascii=False)))
+            text = fake_answer(prompt)
+            if stream:
+                chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model}
+                events = [dict(chunk, choices=[{"index": 0, "delta": {"role": "assistant", "content": tok},
+                                                "finish_reason": None}]) for tok in tokens(text)]
+                events.append(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+                events.append("[DONE]")
+                self._send_sse(events)
+                return
+            self._send_json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                          "total_tokens": (len(prompt) + len(text)) // 4},
+            })
+        elif self.path.endswith("/responses"):
+            prompt = body.get("input")
+            prompt = prompt if isinstance(prompt, str) else json.dumps(prompt, ensure_ascii=False)
+            time.sleep(self.server.prefill_time(prompt))
+            text = fake_answer(prompt)
+            if stream:
+                events = [{"type": "response.output_text.delta", "item_id": "msg-fake", "output_index": 0,
+                           "content_index": 0, "delta": tok, "sequence_number": i}
+                          for i, tok in enumerate(tokens(text))]
+                events.append({"type": "response.output_text.done", "item_id": "msg-fake", "output_index": 0,
+                               "content_index": 0, "text": text, "sequence_number": len(events)})
+                self._send_sse(events)
+                return
+            self._send_json(200, {
+                "id": "resp-fake", "object": "response", "created_at": created, "model": model,
+                "status": "completed", "output": [{
+                    "id": "msg-fake", "type": "message", "role": "assistant", "status": "completed",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}],
+                }],
+            })
+        elif self.path.endswith("/embeddings"):
+            inputs = body.get("input")
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._send_json(200, {
+                "object": "list", "model": model,
+                "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+                         for i, text in enumerate(inputs)],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+        else:
+            self._send_json(404, {"error": {"message": f"unknown endpoint {self.path}"}})
+
+
+def serve(port=1234, capacity=2, latency=0.5, error_rate=0.0, token_delay=0.02, prefill_rate=0.0):
+    server = FakeLMStudio(("127.0.0.1", port), capacity=capacity, latency=latency, error_rate=error_rate,
+                          token_delay=token_delay, prefill_rate=prefill_rate)
+    print(f"fake LM Studio sur http://127.0.0.1:{port}/v1 (capacité={capacity}, latence={latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur factice compatible OpenAI (LM Studio).")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--capacity", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--prefill-rate", type=float, default=0.0, help="caractères de prompt calculés par seconde (0 : instantané)")
+    args = parser.parse_args()
+    serve(args.port, args.capacity, args.latency, args.error_rate, args.token_delay, args.prefill_rate)
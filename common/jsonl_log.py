@@ -0,0 +1,41 @@
+# jsonl_log.py
+
+import json
+import os
+
+# *********************
+# Journaux JSONL en ajout seul (une ligne par entrée), partagés par le registre
+# Actiris et le stockage LinkedIn. Un crash ne peut tronquer que la dernière
+# ligne : elle est ignorée à la lecture et terminée avant le prochain ajout.
+# *********************
+
+
+def line_terminated(path):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def read_jsonl(path):
+    """Lit un journal JSONL en ignorant une dernière ligne tronquée par un crash."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def open_log(path):
+    """Ouvre un journal en ajout, en terminant une éventuelle ligne tronquée."""
+    f = open(path, "a", encoding="utf-8")
+    if not line_terminated(path):
+        # termine la ligne tronquée pour ne pas corrompre l'ajout suivant
+        f.write("\n")
+    return f
@@ -0,0 +1,146 @@
+# llm_cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# *********************
+# Cache persistant des réponses LLM (SQLite), partagé par les deux pipelines.
+# Clé = hash(prompt normalisé, modèle, temperature, top_p, max_tokens).
+# cached_call / acached_call : lecture du cache, appel du modèle si absent, et
+# mise en cache selon `cacheable` (règle unique pour les deux pipelines).
+# *********************
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.sqlite")
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+CACHE_MAX_ENTRIES = 20000
+EVICT_EVERY = 100  # passe d'éviction toutes les N écritures
+
+
+def normalize_prompt(prompt):
+    """Normalise le prompt (unicode NFC, espaces) pour que des variantes triviales partagent la clé."""
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt, ensure_ascii=False, sort_keys=True)
+    prompt = unicodedata.normalize("NFC", prompt)
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in prompt.splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+def make_key(prompt, model, temperature=None, top_p=None, max_tokens=None):
+    payload = json.dumps(
+        [normalize_prompt(prompt), model, temperature, top_p, max_tokens],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+DECISIONS = ("OUI", "NON")
+
+
+def decision_of(text):
+    """Décision (OUI / NON) en tête de la première ligne, ou None si la réponse est vide ou hors format."""
+    lines = (text or "").strip().splitlines()
+    first_line = lines[0].strip().upper() if lines else ""
+    return next((d for d in DECISIONS if first_line.startswith(d)), None)
+
+
+def cacheable(text, finished):
+    """
+    Seul un verdict lisible est mis en cache (une réponse vide ou hors format serait
+    resservie telle quelle) : un NON, même tronqué, ou un OUI complet (un OUI tronqué
+    attend sa justification).
+    """
+    decision = decision_of(text)
+    return decision == "NON" or (decision == "OUI" and finished)
+
+
+class LLMCache:
+    def __init__(self, path=CACHE_PATH, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL;")
+        self.db.executescript('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at);
+        ''')
+        self.db.commit()
+
+    def get(self, key):
+        """Renvoie la réponse en cache pour `key`, ou None (absente ou expirée)."""
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] < self.ttl_seconds:
+                self.db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self.db.commit()
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, response, model=None):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            self.writes += 1
+            if self.writes % EVICT_EVERY == 0:
+                self._evict(now)
+            self.db.commit()
+
+    def _evict(self, now):
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà de `max_entries`."""
+        self.db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def cached_call(cache, key, call, model=None):
+    """
+    Réponse en cache pour `key`, sinon `call()` -> (texte, complet), mis en cache si `cacheable`.
+    Renvoie (texte, complet, servi depuis le cache).
+    """
+    text = cache.get(key)
+    if text is not None:
+        return text, True, True
+    text, finished = call()
+    if cacheable(text, finished):
+        cache.put(key, text, model)
+    return text, finished, False
+
+
+async def acached_call(cache, key, acall, model=None):
+    """Comme `cached_call`, pour une coroutine `acall` ; SQLite est lu et écrit hors de la boucle."""
+    text = await asyncio.to_thread(cache.get, key)
+    if text is not None:
+        return text, True, True
+    text, finished = await acall()
+    if cacheable(text, finished):
+        await asyncio.to_thread(cache.put, key, text, model)
+    return text, finished, False
@@ -0,0 +1,255 @@
+# llm_dispatcher.py
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# *********************
+# Dispatcher des appels LLM avec concurrence adaptative (AIMD).
+# La limite d'appels simultanés augmente de 1 par "aller-retour" tant que la
+# latence reste proche de la meilleure observée, et est divisée par deux en cas
+# d'erreur ou de latence trop élevée (une seule fois par vague d'appels).
+# Latence = temps jusqu'à la décision quand l'appel la signale (mark_decision) :
+# un NON coupé après sa première ligne et un OUI complet restent comparables.
+# `acall` est l'équivalent asyncio de `call` (même limite, mêmes statistiques).
+#   python common/llm_dispatcher.py --check   (baisse puis remontée contre fake_lmstudio)
+# *********************
+
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 8
+INITIAL_CONCURRENCY = 2
+LATENCY_TOLERANCE = 2.0      # latence > 2x la latence de base => surcharge
+DECREASE_FACTOR = 0.5
+BASELINE_WINDOW = 100        # latence de base = minimum des N derniers appels réussis
+
+
+class AdaptiveDispatcher:
+    def __init__(self, min_limit=MIN_CONCURRENCY, max_limit=MAX_CONCURRENCY, initial=INITIAL_CONCURRENCY,
+                 latency_tolerance=LATENCY_TOLERANCE, name="llm"):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.name = name
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.in_flight = 0
+        self.epoch = 0               # incrémenté à chaque diminution
+        self.recent = deque(maxlen=BASELINE_WINDOW)
+        self.ok = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.cond = threading.Condition()
+        self.waiters = []            # (boucle, future) des appels asyncio en attente d'une place
+        # appel en cours dans ce thread / cette tâche asyncio : {"start", "decided"}
+        self.current = contextvars.ContextVar(f"{name}-call", default=None)
+        self.pool = ThreadPoolExecutor(max_workers=max_limit, thread_name_prefix=f"{name}-dispatch")
+
+    @property
+    def current_limit(self):
+        return int(self.limit)
+
+    @property
+    def baseline(self):
+        """Latence "à vide" estimée (secondes) ; suit les changements de modèle via la fenêtre glissante."""
+        return min(self.recent) if self.recent else None
+
+    def _acquire(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+            return self.epoch
+
+    async def _aacquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return self.epoch
+                wake = loop.create_future()
+                self.waiters.append((loop, wake))
+            await wake
+
+    def _notify(self):
+        self.cond.notify_all()
+        waiters, self.waiters = self.waiters, []
+        for loop, wake in waiters:
+            loop.call_soon_threadsafe(_wake, wake)
+
+    def _release(self, epoch, latency, ok):
+        """`ok` : True (réussi), False (erreur), None (annulé : ni succès ni surcharge)."""
+        with self.cond:
+            self.in_flight -= 1
+            if ok is None:
+                self._notify()
+                return
+            if ok:
+                self.ok += 1
+                self.total_latency += latency
+                self.recent.append(latency)
+            else:
+                self.errors += 1
+
+            congested = (not ok) or latency > self.baseline * self.latency_tolerance
+            if congested:
+                # les appels lancés avant la dernière baisse ne la redéclenchent pas
+                if epoch == self.epoch:
+                    self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+                    self.epoch += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._notify()
+
+    def mark_decision(self):
+        """Appelé par `fn` dès que la décision est connue : la latence de l'appel s'arrête là."""
+        state = self.current.get()
+        if state is not None and state["decided"] is None:
+            state["decided"] = time.monotonic() - state["start"]
+
+    def _begin(self):
+        state = {"start": time.monotonic(), "decided": None}
+        return state, self.current.set(state)
+
+    def _end(self, epoch, state, token, ok):
+        self.current.reset(token)
+        latency = state["decided"]
+        if latency is None:
+            latency = time.monotonic() - state["start"]
+        self._release(epoch, latency, ok)
+
+    def call(self, fn, *args, **kwargs):
+        """Exécute `fn(*args, **kwargs)` dès qu'une place est libre (bloquant)."""
+        epoch = self._acquire()
+        state, token = self._begin()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            self._end(epoch, state, token, ok)
+
+    async def acall(self, fn, *args, **kwargs):
+        """Attend une place puis exécute la coroutine `fn(*args, **kwargs)` (boucle asyncio)."""
+        epoch = await self._aacquire()
+        state, token = self._begin()
+        ok = False
+        try:
+            result = await fn(*args, **kwargs)
+            ok = True
+            return result
+        except asyncio.CancelledError:
+            ok = None
+            raise
+        finally:
+            self._end(epoch, state, token, ok)
+
+    def submit(self, fn, *args, **kwargs):
+        """Version asynchrone de `call` ; renvoie un Future."""
+        return self.pool.submit(self.call, fn, *args, **kwargs)
+
+    def stats(self):
+        with self.cond:
+            done = self.ok + self.errors
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "ok": self.ok,
+                "errors": self.errors,
+                "error_rate": round(self.errors / done, 3) if done else 0.0,
+                "avg_latency": round(self.total_latency / self.ok, 3) if self.ok else None,
+                "baseline_latency": round(self.baseline, 3) if self.baseline else None,
+            }
+
+    def describe(self):
+        s = self.stats()
+        return (f"[{self.name}] limite={s['limit']} en vol={s['in_flight']} ok={s['ok']} "
+                f"erreurs={s['errors']} latence moy={s['avg_latency']}s")
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def check_against_fake_server(requests=40):
+    """
+    Vérifie l'AIMD contre common/fake_lmstudio.py lancé sur place : avec une capacité
+    de 2 et une erreur 503 sur 4, la limite doit baisser ; une fois le serveur
+    rétabli (capacité 8, sans erreur), elle doit remonter. Renvoie True si c'est le cas.
+    """
+    from openai import OpenAI
+    from fake_lmstudio import FakeLMStudio
+
+    server = FakeLMStudio(("127.0.0.1", 0), capacity=2, latency=0.1, error_rate=0.25, token_delay=0.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # pas de nouvelle tentative côté client : chaque 503 doit atteindre le dispatcher
+    client = OpenAI(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="fake", max_retries=0)
+    dispatcher = AdaptiveDispatcher(initial=MAX_CONCURRENCY, name="check")
+
+    def run(label):
+        futures = [dispatcher.submit(client.chat.completions.create, model="fake", max_tokens=8,
+                                     messages=[{"role": "user", "content": f"{label} {i}"}])
+                   for i in range(requests)]
+        lowest = dispatcher.current_limit
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception:
+                pass
+            lowest = min(lowest, dispatcher.current_limit)
+        print(f"{label:>9} : {dispatcher.describe()} (limite la plus basse {lowest})")
+        return lowest
+
+    try:
+        lowest = run("surcharge")
+        server.capacity, server.error_rate = 8, 0.0
+        run("rétabli")
+        recovered = dispatcher.current_limit
+    finally:
+        dispatcher.shutdown()
+        server.shutdown()
+        server.server_close()
+
+    backed_off = lowest <= MAX_CONCURRENCY // 4
+    ok = backed_off and recovered > lowest
+    print(f"{'✅' if ok else '❌'} baisse {MAX_CONCURRENCY} → {lowest}, remontée → {recovered}")
+    return ok
+
+
+if __name__ == "__main__":
+    # Démonstration contre un serveur compatible OpenAI (LM Studio ou common/fake_lmstudio.py)
+    import argparse
+    import sys
+    from openai import OpenAI
+
+    parser = argparse.ArgumentParser(description="Charge un endpoint OpenAI-compatible via le dispatcher adaptatif.")
+    parser.add_argument("--base-url", default="http://localhost:1234/v1")
+    parser.add_argument("--model", default="google/gemma-3n-e4b")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--check", action="store_true",
+                        help="vérifie la baisse puis la remontée de la limite contre un serveur factice local")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(0 if check_against_fake_server(args.requests) else 1)
+
+    client = OpenAI(base_url=args.base_url, api_key="lm-studio")
+    dispatcher = AdaptiveDispatcher()
+    futures = [
+        dispatcher.submit(client.chat.completions.create, model=args.model, max_tokens=16,
+                          messages=[{"role": "user", "content": f"Réponds OUI ou NON ({i})"}])
+        for i in range(args.requests)
+    ]
+    for fut in as_completed(futures):
+        try:
+            fut.result()
+        except Exception as e:
+            print("erreur:", e)
+        print(dispatcher.describe())
+    dispatcher.shutdown()
@@ -0,0 +1,86 @@
+# llm_stream.py
+
+# *********************
+# Lecture en streaming des réponses LLM avec arrêt anticipé.
+# La décision (OUI/NON) est sur la première ligne : dès qu'elle est complète,
+# un NON coupe la génération ; un OUI continue (justification immédiate) ou
+# s'arrête aussi si la justification est différée ("defer").
+# `on_decision` est appelé dès que la première ligne est complète (mesure du
+# temps jusqu'à la décision, voir AdaptiveDispatcher.mark_decision).
+# Les variantes a* sont les équivalents asyncio (client AsyncOpenAI).
+# *********************
+
+OUI_MODE = "continue"   # "continue" ou "defer"
+
+
+def chat_deltas(stream):
+    """Morceaux de texte d'un flux `chat.completions.create(stream=True)`."""
+    for chunk in stream:
+        if chunk.choices:
+            yield chunk.choices[0].delta.content or ""
+
+
+def responses_deltas(stream):
+    """Morceaux de texte d'un flux `responses.create(stream=True)`."""
+    for event in stream:
+        if getattr(event, "type", "") == "response.output_text.delta":
+            yield event.delta or ""
+
+
+class FirstLineDecision:
+    """Accumule les morceaux d'une réponse et dit quand couper le flux (première ligne décidée)."""
+
+    def __init__(self, oui_mode=OUI_MODE, on_decision=None):
+        self.oui_mode = oui_mode
+        self.on_decision = on_decision
+        self.parts = []
+        self.decided = False
+
+    def feed(self, piece):
+        """Ajoute `piece` ; renvoie True si la génération doit s'arrêter là."""
+        if not piece:
+            return False
+        self.parts.append(piece)
+        if self.decided:
+            return False
+        text = self.text().lstrip()
+        if "\n" not in text:
+            return False
+        self.decided = True
+        if self.on_decision:
+            self.on_decision()
+        first_line = text.split("\n", 1)[0].strip().upper()
+        return first_line.startswith("NON") or self.oui_mode == "defer"
+
+    def text(self):
+        return "".join(self.parts)
+
+
+def read_until_decision(deltas, close, oui_mode=OUI_MODE, on_decision=None):
+    """
+    Consomme `deltas` et renvoie (texte, complet).
+    `complet` est faux si la génération a été interrompue après la première ligne.
+    """
+    reader = FirstLineDecision(oui_mode, on_decision)
+    for piece in deltas:
+        if reader.feed(piece):
+            close()
+            return reader.text(), False
+    return reader.text(), True
+
+
+async def aresponses_deltas(stream):
+    """Morceaux de texte d'un flux asynchrone `responses.create(stream=True)`."""
+    async for event in stream:
+        if getattr(event, "type", "") == "response.output_text.delta":
+            yield event.delta or ""
+
+
+async def aread_until_decision(deltas, close, oui_mode=OUI_MODE, on_decision=None):
+    """Comme `read_until_decision`, pour un flux asynchrone ; `close` est une coroutine."""
+    reader = FirstLineDecision(oui_mode, on_decision)
+    async for piece in deltas:
+        if reader.feed(piece):
+            await close()
+            return reader.text(), False
+    return reader.text(), True
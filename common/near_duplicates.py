@@ -0,0 +1,174 @@
+# near_duplicates.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from common.prompt_builder import clean_text, html_to_text
+
+# *********************
+# Index des quasi-doublons d'offres, partagé entre Actiris et LinkedIn.
+# Une même offre est souvent publiée sur les deux sites, ou republiée sur
+# LinkedIn sous un nouvel identifiant : chaque offre reçoit une empreinte
+# SimHash (64 bits) de son titre et de sa description normalisés
+# (l'entreprise n'est pas renseignée de la même façon sur les deux sites).
+# Deux offres à au plus MAX_DISTANCE bits d'écart sont considérées comme
+# la même offre : le verdict déjà rendu est réutilisé sans appel au LLM,
+# à condition que les titres normalisés soient identiques (une agence publie
+# souvent les versions Junior et Senior d'un poste avec le même texte).
+# Le titre pèse TITLE_SHARE de l'empreinte, quelle que soit la longueur de la
+# description.
+#
+# Recherche : l'empreinte est découpée en 8 bandes de 8 bits ; deux
+# empreintes à distance <= 7 ont forcément une bande identique (indexée).
+# *********************
+
+MAX_DISTANCE = 6
+MIN_FEATURES = 20            # en dessous, texte trop court pour une empreinte fiable
+SHINGLE_SIZE = 3             # mots consécutifs par caractéristique de la description
+TITLE_SHARE = 0.5            # poids du titre relativement à celui de la description
+TITLE_NOISE = {"hf", "fh", "mf", "mfx", "hfx"}   # mentions de genre, ignorées dans le titre
+BANDS = 8                    # doit rester > MAX_DISTANCE
+BAND_BITS = 64 // BANDS
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "near_duplicates.sqlite")
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text):
+    """Minuscules, sans accents ni HTML : liste des mots."""
+    text = clean_text(html_to_text(text or ""))
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _WORD_RE.findall(text)
+
+
+def title_words(title):
+    """Mots significatifs du titre (sans lettres isolées ni mention de genre type H/F)."""
+    return {w for w in normalize(title) if len(w) > 1 and w not in TITLE_NOISE}
+
+
+def _features(title, description):
+    """Caractéristiques pondérées : shingles de la description, mots du titre (TITLE_SHARE du total)."""
+    features = {}
+    words = normalize(description)
+    for i in range(max(0, len(words) - SHINGLE_SIZE + 1)):
+        shingle = "d:" + " ".join(words[i:i + SHINGLE_SIZE])
+        features[shingle] = features.get(shingle, 0) + 1
+    title = title_words(title)
+    if title:
+        weight = max(2, round(TITLE_SHARE * sum(features.values()) / len(title)))
+        for word in title:
+            features["t:" + word] = weight
+    return features
+
+
+def fingerprint(title, description):
+    """Empreinte SimHash 64 bits de l'offre, ou None si le texte est trop court."""
+    features = _features(title, description)
+    if len(features) < MIN_FEATURES:
+        return None
+    weights = [0] * 64
+    for feature, weight in features.items():
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += weight if (h >> bit) & 1 else -weight
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _bands(fp):
+    mask = (1 << BAND_BITS) - 1
+    return [(fp >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+class NearDuplicateIndex:
+    def __init__(self, path=CACHE_PATH, max_distance=MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript('''
+        CREATE TABLE IF NOT EXISTS offers (
+            offer_id TEXT PRIMARY KEY,
+            source TEXT,
+            link TEXT,
+            title TEXT,
+            company TEXT,
+            simhash TEXT NOT NULL,
+            {band_columns},
+            decision TEXT,
+            justification TEXT,
+            canonical_id TEXT NOT NULL,
+            added_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_offers_canonical ON offers(canonical_id);
+        '''.format(band_columns=", ".join(f"b{i} INTEGER" for i in range(BANDS))))
+        for i in range(BANDS):
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS idx_offers_b{i} ON offers(b{i})")
+        self.db.commit()
+
+    def find(self, fp, title, exclude=None):
+        """Offre déjà analysée la plus proche de l'empreinte `fp` et de même titre (dict), ou None."""
+        if fp is None:
+            return None
+        words = title_words(title)
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT * FROM offers WHERE " + " OR ".join(f"b{i} = ?" for i in range(BANDS)), _bands(fp)
+            ).fetchall()
+        best, best_distance = None, self.max_distance + 1
+        for row in rows:
+            if row["offer_id"] == exclude or title_words(row["title"]) != words:
+                continue
+            d = distance(fp, int(row["simhash"], 16))
+            if d < best_distance:
+                best, best_distance = row, d
+        if best is None:
+            return None
+        with self.lock:
+            self.hits += 1
+        return dict(best, distance=best_distance)
+
+    def add(self, offer_id, fp, source, link, title, decision, justification="", company="", duplicate_of=None):
+        """Enregistre une offre et son verdict ; `duplicate_of` la rattache au groupe d'une offre connue."""
+        if fp is None:
+            return
+        with self.lock:
+            canonical = offer_id
+            if duplicate_of:
+                row = self.db.execute("SELECT canonical_id FROM offers WHERE offer_id = ?",
+                                      (duplicate_of,)).fetchone()
+                canonical = row["canonical_id"] if row else duplicate_of
+            self.db.execute(
+                "INSERT OR REPLACE INTO offers (offer_id, source, link, title, company, simhash,"
+                f" {', '.join(f'b{i}' for i in range(BANDS))}, decision, justification, canonical_id, added_at)"
+                f" VALUES ({', '.join('?' * (BANDS + 10))})",
+                (offer_id, source, link, title, company, format(fp, "016x"), *_bands(fp),
+                 decision, justification, canonical, time.time())
+            )
+            self.db.commit()
+
+    def duplicates(self, offer_id):
+        """Autres publications de la même offre (liste de dicts source / link / title)."""
+        with self.lock:
+            row = self.db.execute("SELECT canonical_id FROM offers WHERE offer_id = ?", (offer_id,)).fetchone()
+            if row is None:
+                return []
+            rows = self.db.execute(
+                "SELECT source, link, title FROM offers WHERE canonical_id = ? AND offer_id != ?"
+                " ORDER BY added_at", (row["canonical_id"], offer_id)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,85 @@
+# prefilter.py
+
+import json
+import os
+import re
+import threading
+
+# *********************
+# Pré-filtre à règles, appliqué avant le LLM par les deux pipelines (Actiris et
+# LinkedIn) : rejette les offres évidentes (contrat, temps de travail, langues,
+# mots-clés exclus...) sans appel au modèle. Règles lues dans RULES_FILENAME.
+#
+# Règles (fichier JSON, clé "rules") :
+#   {"name": "interim", "field": "contract_type", "match": "intérim"}
+#       -> rejet si l'expression est trouvée dans le champ
+#   {"name": "hors-bruxelles", "field": ["location"], "not_match": "Bruxelles|Brussels"}
+#       -> rejet si le champ est renseigné mais ne contient pas l'expression
+# Les expressions sont insensibles à la casse.
+# *********************
+
+RULES_FILENAME = "prefilter_rules.json"
+
+
+def _field_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+class Rule:
+    def __init__(self, name, field, match=None, not_match=None):
+        if not match and not not_match:
+            raise ValueError(f"règle {name!r} : 'match' ou 'not_match' requis")
+        self.name = name
+        self.fields = [field] if isinstance(field, str) else list(field)
+        self.match = re.compile(match, re.IGNORECASE) if match else None
+        self.not_match = re.compile(not_match, re.IGNORECASE) if not_match else None
+
+    def fires(self, offer):
+        text = "\n".join(_field_text(offer.get(f)) for f in self.fields)
+        if self.match is not None and self.match.search(text):
+            return True
+        if self.not_match is not None and text.strip() and not self.not_match.search(text):
+            return True
+        return False
+
+
+class PreFilter:
+    def __init__(self, rules=()):
+        self.rules = [r if isinstance(r, Rule) else Rule(**r) for r in rules]
+        self.hits = {r.name: 0 for r in self.rules}
+        self.checked = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path=RULES_FILENAME):
+        """Charge les règles depuis `path` ; aucun filtrage si le fichier est absent."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("rules", []))
+
+    def check(self, offer):
+        """Nom de la première règle qui rejette `offer`, ou None si l'offre doit aller au LLM."""
+        for rule in self.rules:
+            if rule.fires(offer):
+                with self.lock:
+                    self.checked += 1
+                    self.hits[rule.name] += 1
+                return rule.name
+        with self.lock:
+            self.checked += 1
+        return None
+
+    @property
+    def rejected(self):
+        return sum(self.hits.values())
+
+    def summary(self):
+        detail = ", ".join(f"{name}={n}" for name, n in self.hits.items() if n)
+        return (f"{self.rejected}/{self.checked} offres rejetées sans LLM"
+                + (f" ({detail})" if detail else ""))
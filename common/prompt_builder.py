@@ -0,0 +1,153 @@
+# prompt_builder.py
+
+import hashlib
+import html
+import re
+from html.parser import HTMLParser
+
+from common.prompt_layout import messages_text
+
+# *********************
+# Construction compacte des fiches d'offre envoyées au LLM : HTML -> texte,
+# champs inutiles retirés, lignes "boilerplate" et paragraphes répétés
+# supprimés, puis troncature à un budget de tokens (estimation locale).
+# *********************
+
+PROMPT_TOKEN_BUDGET = 1200   # tokens max pour la fiche d'offre (hors contexte utilisateur)
+
+# Lignes sans intérêt pour la décision (boutons, mentions légales, etc.)
+BOILERPLATE_PATTERNS = [
+    r"^(voir|afficher) (plus|moins)$",
+    r"^(see|show) (more|less)$",
+    r"^…\s*(plus|more)$",
+    r"^(postuler|candidature simplifiée|easy apply|apply|save|enregistrer)$",
+    r"^(à propos de l['’]offre d['’]emploi|about the job)$",
+    r"cookies?",
+    r"^(partager|share)$",
+    r"^#\w+$",
+]
+_BOILERPLATE_RE = re.compile("|".join(f"(?:{p})" for p in BOILERPLATE_PATTERNS), re.IGNORECASE)
+
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+    "section", "article", "tr", "table", "header", "footer",
+}
+SKIP_TAGS = {"script", "style", "noscript", "svg", "button"}
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def count_tokens(text):
+    """Nombre de tokens (tiktoken si installé, sinon estimation mots + ponctuation)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    # les mots longs comptent pour plusieurs tokens (~4 caractères par token)
+    return sum(max(1, len(w) // 4) for w in _WORD_RE.findall(text))
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip = max(0, self.skip - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.parts.append(data)
+
+
+def html_to_text(markup):
+    """Texte lisible d'un fragment HTML (un paragraphe par ligne)."""
+    if not markup:
+        return ""
+    if "<" not in markup:
+        return html.unescape(markup)
+    parser = _TextExtractor()
+    parser.feed(markup)
+    parser.close()
+    return "".join(parser.parts)
+
+
+def clean_text(text):
+    """Normalise les espaces, retire le boilerplate et les paragraphes déjà vus."""
+    seen = set()
+    lines = []
+    for line in text.splitlines():
+        line = re.sub(r"\s+", " ", line).strip()
+        if not line or (_BOILERPLATE_RE.search(line) and len(line) < 80):
+            continue
+        fp = hashlib.md5(line.lower().encode("utf-8")).digest()
+        if fp in seen:
+            continue
+        seen.add(fp)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def truncate_to_budget(text, budget):
+    """Coupe `text` (par la fin) pour tenir dans `budget` tokens."""
+    if budget <= 0:
+        return ""
+    if count_tokens(text) <= budget:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    # évite de couper au milieu d'un mot
+    if " " in cut[-40:]:
+        cut = cut[:cut.rfind(" ")]
+    return cut.rstrip() + " […]"
+
+
+def compact_fields(fields, long_field="description", budget=PROMPT_TOKEN_BUDGET):
+    """
+    Nettoie les valeurs de `fields` (HTML -> texte, boilerplate, doublons) et tronque
+    `long_field` pour que l'ensemble tienne dans `budget` tokens.
+    """
+    compact = {}
+    for key, value in fields.items():
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            compact[key] = value
+            continue
+        value = clean_text(html_to_text(value))
+        if value:
+            compact[key] = value
+
+    if long_field in compact:
+        others = sum(count_tokens(f"{k} : {v}") for k, v in compact.items() if k != long_field)
+        compact[long_field] = truncate_to_budget(compact[long_field], budget - others)
+    return compact
+
+
+def token_report(raw_prompt, prompt):
+    """Tokens avant / après compaction et économie réalisée (`prompt` : texte ou liste de messages)."""
+    before = count_tokens(messages_text(raw_prompt))
+    after = count_tokens(messages_text(prompt))
+    return {"before": before, "after": after, "saved": before - after}
@@ -0,0 +1,110 @@
+# prompt_layout.py
+
+import os
+import random
+import statistics
+import time
+
+# *********************
+# Disposition des prompts pour le cache de préfixe (KV cache) de LM Studio /
+# llama.cpp : le contexte utilisateur, identique d'un appel à l'autre, va dans
+# un message système placé en tête, et la fiche d'offre en dernier. Le serveur
+# ne recalcule alors que les tokens de l'offre.
+# Le contexte ne doit rien contenir de variable (date, compteur...) : un seul
+# octet différent en tête invalide tout le préfixe.
+#   python common/prompt_layout.py --offers 12   (temps au premier token par disposition)
+# *********************
+
+PROMPT_LAYOUT = "system"   # "system" : contexte en message système ; "inline" : prompt historique
+CONTEXT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LinkedinJobs", "user_context.txt")
+LAYOUTS = ("offer-first", "inline", "system")
+
+
+def stable_context(text):
+    """Contexte normalisé une fois pour toutes (espaces de fin), pour un préfixe identique à chaque appel."""
+    return (text or "").strip()
+
+
+def chat_messages(context, offer_part, layout=PROMPT_LAYOUT):
+    """
+    Messages chat d'une analyse :
+     - "system"      : contexte en message système, offre seule dans le message utilisateur
+     - "inline"      : contexte puis offre dans un seul message utilisateur
+     - "offer-first" : offre puis contexte (aucun préfixe réutilisable, référence du benchmark)
+    """
+    if not context:
+        return [{"role": "user", "content": offer_part}]
+    if layout == "system":
+        return [{"role": "system", "content": context}, {"role": "user", "content": offer_part}]
+    if layout == "offer-first":
+        return [{"role": "user", "content": f"{offer_part}\n\n{context}"}]
+    return [{"role": "user", "content": f"{context}\n\n{offer_part}"}]
+
+
+def messages_text(prompt):
+    """Texte d'un prompt, qu'il s'agisse d'une chaîne ou d'une liste de messages."""
+    if isinstance(prompt, str):
+        return prompt
+    return "\n".join(str(m.get("content", "")) for m in prompt)
+
+
+def sample_offer(rng, i):
+    words = ("python django api cloud sql docker équipe projet client données web backend agile "
+             "tests bruxelles télétravail contrat junior développeur analyse support réseau").split()
+    description = " ".join(rng.choice(words) for _ in range(180))
+    return f"Offre à analyser :\n\nTitre : Développeur {i}\nDescription : {description}"
+
+
+def time_to_first_token(client, model, messages):
+    """Secondes jusqu'au premier morceau de texte d'une réponse en streaming."""
+    start = time.perf_counter()
+    stream = client.chat.completions.create(model=model, messages=messages, max_tokens=8, temperature=0.0,
+                                            stream=True)
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                return time.perf_counter() - start
+    finally:
+        stream.close()
+    return time.perf_counter() - start
+
+
+def benchmark(client, model, context, offers=12, layouts=LAYOUTS, seed=0):
+    """
+    Temps au premier token de `offers` analyses successives pour chaque disposition.
+    Le premier appel de chaque série (cache froid) est exclu des moyennes.
+    """
+    context = stable_context(context)
+    if not context:
+        print("Contexte utilisateur vide : les dispositions sont équivalentes.")
+    rng = random.Random(seed)
+    samples = [sample_offer(rng, i) for i in range(offers)]
+    results = {}
+    for layout in layouts:
+        ttft = [time_to_first_token(client, model, chat_messages(context, offer, layout)) for offer in samples]
+        warm = ttft[1:] or ttft
+        results[layout] = {"first": ttft[0], "mean": statistics.mean(warm), "median": statistics.median(warm)}
+        print(f"{layout:>12} : premier appel {ttft[0]:.3f}s | moyenne {results[layout]['mean']:.3f}s "
+              f"| médiane {results[layout]['median']:.3f}s")
+    if "system" in results and "offer-first" in results:
+        gain = results["offer-first"]["median"] / max(results["system"]["median"], 1e-9)
+        print(f"Préfixe en cache : temps au premier token divisé par {gain:.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    from openai import OpenAI
+
+    parser = argparse.ArgumentParser(description="Temps au premier token selon la disposition du prompt.")
+    parser.add_argument("--base-url", default="http://localhost:1234/v1")
+    parser.add_argument("--model", default="google/gemma-3n-e4b")
+    parser.add_argument("--offers", type=int, default=12)
+    parser.add_argument("--context", default=CONTEXT_PATH, help="fichier du contexte utilisateur")
+    parser.add_argument("--layouts", default=",".join(LAYOUTS))
+    args = parser.parse_args()
+
+    with open(args.context, "r", encoding="utf-8") as f:
+        user_context = f.read()
+    client = OpenAI(base_url=args.base_url, api_key="lm-studio")
+    benchmark(client, args.model, user_context, offers=args.offers, layouts=args.layouts.split(","))